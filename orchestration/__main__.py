@@ -0,0 +1,252 @@
+"""Command line entry point: `python -m orchestration <command>`.
+
+Commands
+- serve   start the warm daemon (Unix socket by default, --port for loopback HTTP)
+- submit  send a goal to a running daemon (thin client)
+- run     run a goal in-process (no daemon)
+- cancel  cancel a running run by runId (in a daemon, worker or another process sharing runtime/)
+- cache   manage memoized node outputs (`cache invalidate [--node plan_step]`)
+- approvals  cached approval decisions (`approvals list [--all]`, `approvals revoke --id ID | --fingerprint FP | --all`)
+- enqueue  add a goal to the durable job queue (runtime/jobs.sqlite3)
+- worker   claim and run queued jobs (`--concurrency N`; run one per process/host to scale out; `--batch` sends
+           provider calls through the Message Batches API)
+- jobs     queue status, or a job's stored result (`jobs get <id>`)
+- index    build/update the trigram index over tracked files and report stats (`index --query "..."`)
+- artifacts  per-run artifact store (`artifacts latest`, `artifacts gc [--keep-runs N] [--max-age-days D]`)
+"""
+from __future__ import annotations
+from typing import List, Optional
+import argparse
+import json
+import os
+import sys
+
+
+def _json_arg(value: Optional[str]) -> dict:
+    return json.loads(value) if value else {}
+
+
+def _cmd_serve(args: argparse.Namespace) -> int:
+    from .server import OrchestrationServer
+
+    try:
+        OrchestrationServer(socket_path=args.socket, host=args.host, port=args.port).serve_forever(drain_timeout=args.drain_timeout)
+    except RuntimeError as e:  # another daemon owns the socket
+        print(json.dumps({"error": str(e)}))
+        return 1
+    return 0
+
+
+def _cmd_submit(args: argparse.Namespace) -> int:
+    from . import server
+
+    constraints, context = _json_arg(args.constraints), _json_arg(args.context)
+    try:
+        if args.stream:
+            for msg in server.stream(args.goal, constraints, context, address=args.address):
+                if "event" in msg:
+                    ev = msg["event"]
+                    print(json.dumps({"kind": ev.get("kind"), "phase": ev.get("phase"), "status": ev.get("status"), "data": ev.get("data")}, ensure_ascii=False), flush=True)
+                else:
+                    print(json.dumps(msg, ensure_ascii=False, default=str), flush=True)
+            return 0
+        print(json.dumps(server.submit(args.goal, constraints, context, address=args.address), ensure_ascii=False, default=str))
+    except OSError as e:  # no daemon listening (missing socket, refused, reset)
+        print(json.dumps({"error": f"cannot reach the orchestration daemon ({type(e).__name__}: {e}); start it with `python -m orchestration serve`"}))
+        return 1
+    return 0
+
+
+def _cmd_run(args: argparse.Namespace) -> int:
+    from .graph import run_goal
+
+    result = run_goal(args.goal, constraints=_json_arg(args.constraints), context=_json_arg(args.context))
+    print(json.dumps(result, ensure_ascii=False, default=str))
+    return 0
+
+
+def _cmd_cancel(args: argparse.Namespace) -> int:
+    if args.address:
+        from . import server
+
+        print(json.dumps(server.cancel(args.run_id, address=args.address)))
+        return 0
+    from .cancel import request_cancel, valid_run_id
+
+    if not valid_run_id(args.run_id):
+        print(json.dumps({"error": "invalid runId"}))
+        return 1
+    request_cancel(args.run_id)
+    print(json.dumps({"runId": args.run_id, "requested": True}))
+    return 0
+
+
+def _cmd_cache(args: argparse.Namespace) -> int:
+    from . import memo
+
+    print(json.dumps({"removed": memo.invalidate(args.node)}))
+    return 0
+
+
+def _cmd_approvals(args: argparse.Namespace) -> int:
+    from dataclasses import asdict
+    from . import approvals
+
+    if args.action == "revoke":
+        if not (args.id or args.fingerprint or args.all):
+            print(json.dumps({"error": "pass --id, --fingerprint or --all"}))
+            return 1
+        revoked = approvals.revoke(fp=args.fingerprint, decision_id=args.id, by=args.by, reason=args.reason)
+        print(json.dumps({"revoked": [x.id for x in revoked]}))
+        return 0
+    print(json.dumps([asdict(x) for x in approvals.decisions(include_inactive=args.all)], ensure_ascii=False, default=str))
+    return 0
+
+
+def _cmd_artifacts(args: argparse.Namespace) -> int:
+    from .artifacts import ArtifactStore
+
+    store = ArtifactStore()
+    if args.action == "gc":
+        print(json.dumps(store.gc(keep_runs=args.keep_runs, max_age_days=args.max_age_days)))
+    else:
+        run_id = store.latest()
+        print(json.dumps({"runId": run_id, "dir": store.run_dir(run_id) if run_id else None}))
+    return 0
+
+
+def _cmd_index(args: argparse.Namespace) -> int:
+    import time
+    from .index import TrigramIndex, git_head
+    from .warm import _git_ls_files
+
+    index = TrigramIndex()
+    if args.rebuild:
+        index.update([])
+    out = {"build": index.update(_git_ls_files(index.repo_root), head=git_head(index.repo_root))}
+    if args.query:
+        t0 = time.perf_counter()
+        hits = index.search(args.query, k=args.k)
+        out["query_ms"] = round((time.perf_counter() - t0) * 1000.0, 2)
+        out["hits"] = [h.to_dict() for h in hits]
+    index.close()
+    print(json.dumps(out, ensure_ascii=False))
+    return 0
+
+
+def _cmd_enqueue(args: argparse.Namespace) -> int:
+    from .jobqueue import JobQueue
+
+    job_id = JobQueue(args.db).enqueue(args.goal, _json_arg(args.constraints), _json_arg(args.context), priority=args.priority, max_attempts=args.max_attempts)
+    print(json.dumps({"jobId": job_id}))
+    return 0
+
+
+def _cmd_worker(args: argparse.Namespace) -> int:
+    from .jobqueue import run_workers
+
+    if args.batch:
+        os.environ["WARP_BATCH"] = "1"  # providers/batching.py: this process only runs queue jobs, which can wait
+    done = run_workers(concurrency=args.concurrency, path=args.db, lease_s=args.lease, poll_s=args.poll, max_jobs=args.max_jobs, exit_when_idle=args.exit_when_idle)
+    print(json.dumps({"processed": done}))
+    return 0
+
+
+def _cmd_jobs(args: argparse.Namespace) -> int:
+    from dataclasses import asdict
+    from .jobqueue import JobQueue
+
+    queue = JobQueue(args.db)
+    if args.action == "get":
+        job = queue.get(args.job_id or "")
+        print(json.dumps(asdict(job) if job else {"error": "not found"}, ensure_ascii=False, default=str))
+        return 0 if job else 1
+    print(json.dumps(queue.counts()))
+    return 0
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="orchestration")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    p = sub.add_parser("serve", help="start the warm orchestration daemon")
+    p.add_argument("--socket", help="Unix socket path (default runtime/orchestration.sock)")
+    p.add_argument("--host", default="127.0.0.1")
+    p.add_argument("--port", type=int, help="serve loopback HTTP on this port instead of a Unix socket")
+    p.add_argument("--drain-timeout", type=float, default=300.0, help="seconds to wait for in-flight runs on shutdown")
+    p.set_defaults(func=_cmd_serve)
+
+    for name, func, help_text in (("submit", _cmd_submit, "send a goal to a running daemon"), ("run", _cmd_run, "run a goal in-process")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("goal")
+        p.add_argument("--constraints", help="JSON object")
+        p.add_argument("--context", help="JSON object")
+        if name == "submit":
+            p.add_argument("--address", help="unix:/path/to.sock or http://host:port (default runtime socket)")
+            p.add_argument("--stream", action="store_true", help="stream events as NDJSON while the run progresses")
+        p.set_defaults(func=func)
+
+    p = sub.add_parser("cancel", help="cancel a running run")
+    p.add_argument("run_id", help="runId (jobs run under their jobId)")
+    p.add_argument("--address", help="ask this daemon directly instead of leaving a cancel flag in runtime/cancel/")
+    p.set_defaults(func=_cmd_cancel)
+
+    p = sub.add_parser("cache", help="manage memoized node outputs")
+    p.add_argument("action", choices=["invalidate"])
+    p.add_argument("--node", choices=["plan_step", "execute_step", "validate_step"], help="only this node (default all)")
+    p.set_defaults(func=_cmd_cache)
+
+    p = sub.add_parser("approvals", help="cached approval decisions")
+    p.add_argument("action", choices=["list", "revoke"])
+    p.add_argument("--id", help="revoke this decision")
+    p.add_argument("--fingerprint", help="revoke every live decision for this fingerprint")
+    p.add_argument("--all", action="store_true", help="list: include expired/revoked; revoke: every live decision")
+    p.add_argument("--by", default="cli", help="recorded as the revoker")
+    p.add_argument("--reason")
+    p.set_defaults(func=_cmd_approvals)
+
+    p = sub.add_parser("enqueue", help="add a goal to the job queue")
+    p.add_argument("goal")
+    p.add_argument("--constraints", help="JSON object")
+    p.add_argument("--context", help="JSON object")
+    p.add_argument("--priority", type=int, default=0, help="higher runs first")
+    p.add_argument("--max-attempts", type=int, default=3)
+    p.add_argument("--db", help="queue database (default runtime/jobs.sqlite3 or $WARP_JOBS_DB)")
+    p.set_defaults(func=_cmd_enqueue)
+
+    p = sub.add_parser("worker", help="run queued jobs")
+    p.add_argument("--concurrency", type=int, default=1, help="worker threads in this process")
+    p.add_argument("--lease", type=float, default=60.0, help="lease seconds; heartbeats renew it every lease/3")
+    p.add_argument("--poll", type=float, default=1.0, help="idle poll interval seconds")
+    p.add_argument("--max-jobs", type=int, help="exit after this many jobs per thread")
+    p.add_argument("--exit-when-idle", action="store_true")
+    p.add_argument("--batch", action="store_true", help="send provider calls as Message Batches (half price, slower; WARP_BATCH_* knobs)")
+    p.add_argument("--db", help="queue database (default runtime/jobs.sqlite3 or $WARP_JOBS_DB)")
+    p.set_defaults(func=_cmd_worker)
+
+    p = sub.add_parser("jobs", help="job queue status / results")
+    p.add_argument("action", choices=["status", "get"])
+    p.add_argument("job_id", nargs="?")
+    p.add_argument("--db", help="queue database (default runtime/jobs.sqlite3 or $WARP_JOBS_DB)")
+    p.set_defaults(func=_cmd_jobs)
+
+    p = sub.add_parser("index", help="trigram index over tracked files")
+    p.add_argument("--query", help="rank files for this text and report latency")
+    p.add_argument("-k", type=int, default=8, help="number of hits")
+    p.add_argument("--rebuild", action="store_true", help="drop the index and build from scratch")
+    p.set_defaults(func=_cmd_index)
+
+    from .artifacts import DEFAULT_KEEP_RUNS, DEFAULT_MAX_AGE_DAYS
+
+    p = sub.add_parser("artifacts", help="per-run artifact store")
+    p.add_argument("action", choices=["latest", "gc"])
+    p.add_argument("--keep-runs", type=int, default=DEFAULT_KEEP_RUNS)
+    p.add_argument("--max-age-days", type=float, default=DEFAULT_MAX_AGE_DAYS)
+    p.set_defaults(func=_cmd_artifacts)
+
+    args = parser.parse_args(argv)
+    return int(args.func(args) or 0)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
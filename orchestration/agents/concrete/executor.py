@@ -1,30 +1,88 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Dict, Any, List
-from ..models.router import ModelRouter
-from ..logging import log_event
+from typing import Dict, Any, List, Optional
+from ...jsonparse import extract_json, is_object
+from ...cancel import CancelToken
+from ...models.router import ModelRouter, default_router
+from ...providers.base import DEFAULT_TIMEOUT_S
+from ...logging import log_event
+
+_COMMANDS = {"type": "array", "items": {"type": "array", "items": {"type": "string"}}}
+ACTIONS_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {"posix": _COMMANDS, "windows": _COMMANDS},
+    "required": ["posix", "windows"],
+}
+
+_FALLBACK = {
+    "posix": [["bash", "05_WORKFLOWS/slash-commands/build/build.sh"]],
+    "windows": [["pwsh", "-File", "05_WORKFLOWS/slash-commands/build/build.ps1"]],
+}
+
+
+def _valid_actions(data: Any) -> bool:
+    if not isinstance(data, dict):
+        return False
+    for key in ACTIONS_SCHEMA["required"]:
+        cmds = data.get(key)
+        if not isinstance(cmds, list) or not all(isinstance(cmd, list) and all(isinstance(part, str) for part in cmd) for cmd in cmds):
+            return False
+    return True
+
+
+def _complete(result: Dict[str, Any]) -> bool:
+    """Valid shape and not recovered from truncated output (a cut-off command is not an action)."""
+    return _valid_actions(result.get("data")) and not result.get("partial")
+
 
 @dataclass
 class Executor:
     profile: str = "claude-execution"
+    router: Optional[ModelRouter] = None  # shared/warm router (orchestration serve)
+    cancel: Optional[CancelToken] = None  # run deadline/cancellation; bounds the provider timeout
+
+    def _timeout(self) -> Optional[float]:
+        return self.cancel.timeout(DEFAULT_TIMEOUT_S) if self.cancel else None
+
+    def _ask(self, client: Any, system: str, prompt: str) -> Dict[str, Any]:
+        if client is None:
+            text = "{\"posix\":[[\"bash\",\"05_WORKFLOWS/...\"]], \"windows\":[[\"pwsh\",\"-File\",\"05_WORKFLOWS/...\"]]}"
+            found = extract_json(text, accept=is_object)
+            return {"text": text, "usage": {}, "data": found.value if found else None, "mode": "text", "partial": False}
+        return client.generate_json(system, prompt, ACTIONS_SCHEMA, timeout=self._timeout())
 
     def run(self, plan: List[str]) -> Dict[str, Any]:
-        router = ModelRouter()
-        client = router.get_client(self.profile)
+        router = self.router or default_router()
+        client = router.get_client(self.profile, cancel=self.cancel)
         system = "You translate a high-level plan into shell commands for POSIX and PowerShell. Reply ONLY valid JSON with keys 'posix' and 'windows', each an array of arrays of strings (the shell command)."
         prompt = "\n".join(f"- {s}" for s in plan)
         log_event("agent_request", {"profile": self.profile}, agent="executor", phase="execute")
-        result = client.generate(system, prompt) if client else {"text": "{\"posix\":[[\"bash\",\"05_WORKFLOWS/...\"]], \"windows\":[[\"pwsh\",\"-File\",\"05_WORKFLOWS/...\"]]}", "usage": {}}
-        log_event("agent_response", {"usage": result.get("usage")}, agent="executor", phase="execute")
-        # Best-effort parse JSON, else fallback to deterministic
-        import json, re
-        raw = result.get("text", "")
-        m = re.search(r"\{[\s\S]*\}$", raw.strip())
-        try:
-            data = json.loads(m.group(0) if m else raw)
-        except Exception:
-            data = {
-                "posix": [["bash", "05_WORKFLOWS/slash-commands/build/build.sh"]],
-                "windows": [["pwsh", "-File", "05_WORKFLOWS/slash-commands/build/build.ps1"]],
-            }
-        return {"actions": data, "raw": {"text": raw, "usage": result.get("usage")}}
+        result = self._ask(client, system, prompt)
+        log_event("agent_response", {"usage": result.get("usage"), "cache": result.get("cache")}, agent="executor", phase="execute")
+        if result.get("mock"):
+            # Keyless mode: there is no model reply to parse or repair
+            return {"actions": dict(_FALLBACK), "degraded": False, "raw": {"text": result.get("text", ""), "usage": result.get("usage")}}
+        attempts = 1
+        repaired = False
+        if not _complete(result) and client is not None:
+            # One repair round-trip, showing the model what it sent
+            repair = f"{prompt}\n\nYour previous reply was not valid JSON for the required shape:\n{(result.get('text') or '')[:2000]}\n\nReply again with ONLY the JSON object."
+            log_event("agent_request", {"profile": self.profile, "repair": True}, agent="executor", phase="execute")
+            retry = self._ask(client, system, repair)
+            log_event("agent_response", {"usage": retry.get("usage"), "cache": retry.get("cache"), "repair": True}, agent="executor", phase="execute")
+            attempts = 2
+            if _complete(retry):
+                result, repaired = retry, True
+        data = result.get("data")
+        ok = _complete(result)
+        log_event("parse_metrics", {
+            "ok": ok,
+            "mode": result.get("mode"),
+            "partial": bool(result.get("partial")),
+            "repaired": repaired,
+            "attempts": attempts,
+            "parse_ms": round(result.get("parse_ms", 0.0), 3),
+        }, agent="executor", phase="execute")
+        if not ok:
+            data = dict(_FALLBACK)
+        return {"actions": data, "degraded": not ok, "raw": {"text": result.get("text", ""), "usage": result.get("usage")}}
@@ -1,21 +1,36 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import List, Dict, Any
-from ..models.router import ModelRouter
-from ..logging import log_event
+from typing import List, Dict, Any, Optional
+from ...cancel import CancelToken
+from ...models.router import ModelRouter, default_router
+from ...providers.base import DEFAULT_TIMEOUT_S, Segment
+from ...logging import log_event
 
 @dataclass
 class Planner:
     profile: str = "deepseek-planning"
+    router: Optional[ModelRouter] = None  # shared/warm router (orchestration serve)
+    cancel: Optional[CancelToken] = None  # run deadline/cancellation; bounds the provider timeout
 
-    def run(self, goal: str, context_hint: List[str]) -> Dict[str, Any]:
-        router = ModelRouter()
-        client = router.get_client(self.profile)
+    def _timeout(self) -> Optional[float]:
+        return self.cancel.timeout(DEFAULT_TIMEOUT_S) if self.cancel else None
+
+    def run(self, goal: str, context_hint: List[str], relevant: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        router = self.router or default_router()
+        client = router.get_client(self.profile, cancel=self.cancel)
         system = "You are a planning agent. Output a bullet list of 3-7 steps to achieve the goal. Each line starts with '- '."
-        prompt = f"Goal: {goal}\nContext: {', '.join(context_hint or [])}"
+        # Stable repo context first (cacheable across runs and retries of a goal), the goal itself last
+        prompt = [Segment(f"Context: {', '.join(context_hint or [])}\n", cache=True)]
+        if relevant:
+            lines = []
+            for hit in relevant:
+                lines.append(f"- {hit['path']}")
+                lines.extend(f"    {s['line']}: {s['text']}" for s in hit.get("snippets") or [])
+            prompt.append(Segment("Relevant files:\n" + "\n".join(lines) + "\n", cache=True))
+        prompt.append(Segment(f"Goal: {goal}"))
         log_event("agent_request", {"profile": self.profile, "goal": goal}, agent="planner", phase="plan")
-        result = client.generate(system, prompt) if client else {"text": "- Draft plan (fallback)", "usage": {}}
-        log_event("agent_response", {"usage": result.get("usage")}, agent="planner", phase="plan")
+        result = client.generate(system, prompt, timeout=self._timeout()) if client else {"text": "- Draft plan (fallback)", "usage": {}}
+        log_event("agent_response", {"usage": result.get("usage"), "cache": result.get("cache")}, agent="planner", phase="plan")
         # Normalize to list of steps
         text = result.get("text", "")
         steps = [s.strip("- ") for s in text.splitlines() if s.strip()]
@@ -1,20 +1,27 @@
 from __future__ import annotations
 from dataclasses import dataclass
-from typing import Dict, Any
-from ..models.router import ModelRouter
-from ..logging import log_event
+from typing import Dict, Any, Optional
+from ...cancel import CancelToken
+from ...models.router import ModelRouter, default_router
+from ...providers.base import DEFAULT_TIMEOUT_S
+from ...logging import log_event
 
 @dataclass
 class Validator:
     profile: str = "claude-execution"
+    router: Optional[ModelRouter] = None  # shared/warm router (orchestration serve)
+    cancel: Optional[CancelToken] = None  # run deadline/cancellation; bounds the provider timeout
+
+    def _timeout(self) -> Optional[float]:
+        return self.cancel.timeout(DEFAULT_TIMEOUT_S) if self.cancel else None
 
     def run(self, summary: Dict[str, Any]) -> Dict[str, Any]:
-        router = ModelRouter()
-        client = router.get_client(self.profile)
+        router = self.router or default_router()
+        client = router.get_client(self.profile, cancel=self.cancel)
         system = "You are a validator that summarizes validation checks and risks in exactly 3 bullet points."
         prompt = str(summary)
         log_event("agent_request", {"profile": self.profile}, agent="validator", phase="validate")
-        result = client.generate(system, prompt) if client else {"text": "- Tools OK\n- Risks low\n- Proceed", "usage": {}}
-        log_event("agent_response", {"usage": result.get("usage")}, agent="validator", phase="validate")
+        result = client.generate(system, prompt, timeout=self._timeout()) if client else {"text": "- Tools OK\n- Risks low\n- Proceed", "usage": {}}
+        log_event("agent_response", {"usage": result.get("usage"), "cache": result.get("cache")}, agent="validator", phase="validate")
         bullets = [s.strip("- ") for s in result.get("text", "").splitlines() if s.strip()]
         return {"bullets": bullets, "raw": result}
@@ -0,0 +1,202 @@
+"""Cache of human approval decisions for manual (risky) actions.
+
+A decision is keyed by a fingerprint of exactly what was approved:
+(cmd, paths, approval policy version, repo revision). Changing the command,
+its paths, the approval policy in .warp/agent-config.yml (config.POLICY_FIELDS;
+not the cache settings) or the working tree (HEAD tree plus uncommitted
+changes outside runtime/) gives a new fingerprint, so a stale approval never
+matches. Each decision carries a TTL and a scope:
+- run      only the run that was approved (e.g. a retried execute_step)
+- session  runs with the same constraints.sessionId (default: the warm
+           daemon / worker process the run was approved in)
+- global   any run, until it expires
+
+execute_step pre-clears manual actions that match a live decision and logs
+approval_reused for each; revoke() marks decisions revoked (approval_revoked)
+rather than deleting them, so the audit trail survives. Decisions live in
+runtime/approvals/<fingerprint>.json.
+
+Defaults come from .warp/agent-config.yml (shipped: `approval.cache: {scope:
+session, ttl_s: 3600}`; without it scope "run" for one hour); an approval_granted event
+may override them with data.scope / data.ttl_s, and scope "none" records
+nothing. constraints {"reuse_approvals": false} skips lookups for a run.
+"""
+from __future__ import annotations
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+import uuid
+
+from .logging import log_event
+
+SCOPES = ("run", "session", "global")
+DEFAULT_SCOPE = "run"
+DEFAULT_TTL_S = 3600.0
+# Expired/revoked decisions stay on disk this long for auditing, then are dropped on the next write
+AUDIT_KEEP_S = 7 * 86400.0
+
+_lock = threading.Lock()
+
+
+def _dir() -> str:
+    root = os.path.dirname(os.path.dirname(__file__))
+    runtime = os.environ.get("WARP_RUNTIME_DIR") or os.path.join(root, "runtime")
+    return os.path.join(runtime, "approvals")
+
+
+def fingerprint(cmd: Any, paths: Optional[List[str]], policy: str, revision: str) -> str:
+    raw = json.dumps([cmd, sorted(paths or []), policy, revision], sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def repo_revision() -> str:
+    from .memo import repo_tree_hash
+
+    return repo_tree_hash()
+
+
+def session_of(state: Dict[str, Any]) -> Optional[str]:
+    """constraints.sessionId, else the warm context's session (daemon/worker process)."""
+    sid = (state.get("constraints") or {}).get("sessionId")
+    if sid:
+        return str(sid)
+    return getattr(state.get("warm"), "session_id", None)
+
+
+def ttl_seconds(value: Any, default: float) -> float:
+    """value as seconds; default when it is missing, not a number ("1h") or not finite."""
+    try:
+        ttl = float(value)
+    except (TypeError, ValueError):
+        return default
+    return ttl if math.isfinite(ttl) else default
+
+
+def defaults(config: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """Cache settings from the agent config; an unknown scope or a bad ttl_s falls back to the default."""
+    opt = (config or {}).get("approval_cache") or {}
+    if not isinstance(opt, dict):
+        opt = {}
+    scope = str(opt.get("scope", DEFAULT_SCOPE)).strip().lower()
+    if scope not in SCOPES and scope != "none":
+        scope = DEFAULT_SCOPE
+    return {"scope": scope, "ttl_s": ttl_seconds(opt.get("ttl_s"), DEFAULT_TTL_S)}
+
+
+@dataclass
+class Decision:
+    id: str
+    fingerprint: str
+    scope: str
+    granted_at: float
+    expires_at: float
+    granted_by: Optional[str] = None
+    run_id: Optional[str] = None
+    session_id: Optional[str] = None
+    cmd: Any = None
+    paths: List[str] = field(default_factory=list)
+    policy: str = ""
+    revision: str = ""
+    revoked_at: Optional[float] = None
+    revoked_by: Optional[str] = None
+    revoke_reason: Optional[str] = None
+
+    def live(self, now: Optional[float] = None) -> bool:
+        return self.revoked_at is None and (now or time.time()) < self.expires_at
+
+    def applies_to(self, run_id: Optional[str], session_id: Optional[str]) -> bool:
+        if self.scope == "global":
+            return True
+        if self.scope == "session":
+            return session_id is not None and session_id == self.session_id
+        return run_id is not None and run_id == self.run_id
+
+
+def _path(fp: str) -> str:
+    return os.path.join(_dir(), f"{fp}.json")
+
+
+def _load(fp: str) -> List[Decision]:
+    try:
+        with open(_path(fp), "r", encoding="utf-8") as f:
+            return [Decision(**d) for d in (json.load(f) or {}).get("decisions") or []]
+    except Exception:
+        return []
+
+
+def _save(fp: str, decisions: List[Decision]) -> None:
+    d = _dir()
+    os.makedirs(d, exist_ok=True)
+    tmp = os.path.join(d, f".{fp}.{os.getpid()}.{threading.get_ident()}.tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"fingerprint": fp, "decisions": [asdict(x) for x in decisions]}, f, ensure_ascii=False, indent=2, default=str)
+    os.replace(tmp, _path(fp))
+
+
+def record(fp: str, scope: str, ttl_s: float, run_id: Optional[str] = None, session_id: Optional[str] = None, granted_by: Optional[str] = None, cmd: Any = None, paths: Optional[List[str]] = None, policy: str = "", revision: str = "") -> Optional[Decision]:
+    """Store a granted approval; returns None (nothing stored) for scope "none"/unknown or ttl <= 0."""
+    if scope not in SCOPES or ttl_s <= 0:
+        return None
+    if scope == "session" and not session_id:
+        return None  # nothing could ever match it
+    now = time.time()
+    decision = Decision(
+        id=uuid.uuid4().hex[:16], fingerprint=fp, scope=scope, granted_at=now, expires_at=now + ttl_s,
+        granted_by=granted_by, run_id=run_id, session_id=session_id, cmd=cmd, paths=list(paths or []), policy=policy, revision=revision,
+    )
+    try:
+        with _lock:
+            kept = [x for x in _load(fp) if x.live(now) or now - min(x.expires_at, x.revoked_at or x.expires_at) < AUDIT_KEEP_S]
+            _save(fp, kept + [decision])
+    except Exception:
+        return None
+    log_event("approval_recorded", {"runId": run_id, "decisionId": decision.id, "fingerprint": fp, "scope": scope, "ttl_s": ttl_s, "grantedBy": granted_by})
+    return decision
+
+
+def lookup(fp: str, run_id: Optional[str], session_id: Optional[str]) -> Optional[Decision]:
+    """Newest live decision for fp that applies to this run/session."""
+    now = time.time()
+    for decision in reversed(_load(fp)):
+        if decision.live(now) and decision.applies_to(run_id, session_id):
+            return decision
+    return None
+
+
+def decisions(include_inactive: bool = False) -> List[Decision]:
+    out: List[Decision] = []
+    try:
+        names = sorted(os.listdir(_dir()))
+    except OSError:
+        return out
+    now = time.time()
+    for name in names:
+        if name.endswith(".json") and not name.startswith("."):
+            out.extend(x for x in _load(name[:-5]) if include_inactive or x.live(now))
+    return sorted(out, key=lambda x: x.granted_at)
+
+
+def revoke(fp: Optional[str] = None, decision_id: Optional[str] = None, by: Optional[str] = None, reason: Optional[str] = None) -> List[Decision]:
+    """Revoke live decisions by fingerprint and/or id (neither: all); returns the revoked ones."""
+    revoked: List[Decision] = []
+    now = time.time()
+    with _lock:
+        fps = [fp] if fp else sorted({x.fingerprint for x in decisions()})
+        for f in fps:
+            items = _load(f)
+            changed = False
+            for x in items:
+                if x.live(now) and (decision_id is None or x.id == decision_id):
+                    x.revoked_at, x.revoked_by, x.revoke_reason = now, by, reason
+                    revoked.append(x)
+                    changed = True
+            if changed:
+                _save(f, items)
+    for x in revoked:
+        log_event("approval_revoked", {"decisionId": x.id, "fingerprint": x.fingerprint, "scope": x.scope, "by": by, "reason": reason})
+    return revoked
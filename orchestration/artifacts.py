@@ -0,0 +1,234 @@
+"""Per-run artifact namespaces backed by a content-addressed blob store.
+
+Layout under runtime/artifacts/
+- blobs/<ab>/<sha256>         file contents, stored once whatever the number of runs
+- runs/<ab>/<runId>/<name>    hard links to blobs (copies where links are unsupported)
+- runs/<ab>/<runId>/manifest.json  {name: sha256} plus run metadata
+- LATEST                      runId of the most recently completed run
+
+A run directory is assembled in a temp dir and published with one rename,
+so readers never see a half-written run and concurrent runs never collide.
+gc() applies the retention policy (keep N newest / max age) and sweeps blobs
+no surviving manifest references. Runs never pay for it: about 1 in
+GC_EVERY publishes leaves a `.gc-due` marker that run_goal claims on its way
+out, collecting on a background thread in the daemon / job workers
+(collect_in_background(), also called when idle) and in a detached
+`artifacts gc` process for one-shot callers that may exit first
+(collect_detached()). `artifacts gc` runs it on demand.
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional
+import hashlib
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import threading
+import time
+
+DEFAULT_KEEP_RUNS = int(os.environ.get("WARP_ARTIFACTS_KEEP_RUNS", "1000"))
+DEFAULT_MAX_AGE_DAYS = float(os.environ.get("WARP_ARTIFACTS_MAX_AGE_DAYS", "30"))
+GC_EVERY = int(os.environ.get("WARP_ARTIFACTS_GC_EVERY", "200"))  # ~1 in N writes marks gc due
+BLOB_GRACE_S = 3600.0  # blobs touched this recently may belong to a run still being published
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _runtime_dir() -> str:
+    root = ROOT
+    path = os.environ.get("WARP_RUNTIME_DIR") or os.path.join(root, "runtime")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _atomic_write(path: str, data: bytes) -> None:
+    tmp = f"{path}.{os.getpid()}.{os.urandom(4).hex()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(data)
+    os.replace(tmp, path)
+
+
+class ArtifactStore:
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.path.join(_runtime_dir(), "artifacts")
+        self.blobs = os.path.join(self.root, "blobs")
+        self.runs = os.path.join(self.root, "runs")
+        os.makedirs(self.blobs, exist_ok=True)
+        os.makedirs(self.runs, exist_ok=True)
+
+    # -- blobs ------------------------------------------------------------
+    def blob_path(self, digest: str) -> str:
+        return os.path.join(self.blobs, digest[:2], digest)
+
+    def put_blob(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_path(digest)
+        try:
+            os.utime(path)  # refresh so a concurrent gc() leaves it alone
+        except OSError:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            _atomic_write(path, data)
+        return digest
+
+    # -- runs -------------------------------------------------------------
+    def run_dir(self, run_id: str) -> str:
+        """runs/<ab>/<runId>; ValueError if the id would resolve anywhere else ("..", ".", "a/b")
+        or is dot-prefixed (reserved for publish temp dirs, invisible to gc)."""
+        path = os.path.normpath(os.path.join(self.runs, run_id[:2], run_id))
+        if not run_id or run_id.startswith(".") or os.path.basename(path) != run_id or os.path.dirname(os.path.dirname(path)) != os.path.normpath(self.runs):
+            raise ValueError(f"unsafe run id: {run_id!r}")
+        return path
+
+    def write_run(self, run_id: str, files: Dict[str, bytes], meta: Optional[Dict[str, Any]] = None) -> str:
+        final = self.run_dir(run_id)  # validated before anything below is created, replaced or removed
+        parent = os.path.dirname(final)
+        os.makedirs(parent, exist_ok=True)
+        tmp = os.path.join(parent, f".{run_id}.{os.getpid()}.tmp")
+        os.makedirs(tmp, exist_ok=True)
+        manifest: Dict[str, Any] = {"runId": run_id, "created": time.time(), "files": {}, **(meta or {})}
+        for name, data in files.items():
+            digest = self.put_blob(data)
+            manifest["files"][name] = digest
+            target = os.path.join(tmp, name)
+            try:
+                os.link(self.blob_path(digest), target)
+            except OSError:
+                shutil.copyfile(self.blob_path(digest), target)
+        with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+        if os.path.isdir(final):  # re-publish of the same runId: replace wholesale
+            shutil.rmtree(final, ignore_errors=True)
+        os.rename(tmp, final)
+        _atomic_write(os.path.join(self.root, "LATEST"), run_id.encode("utf-8"))
+        if GC_EVERY > 0 and random.random() < 1.0 / GC_EVERY:
+            _atomic_write(self._gc_marker(), b"")  # collected later by an idle daemon/worker
+        return final
+
+    def _gc_marker(self) -> str:
+        return os.path.join(self.root, ".gc-due")
+
+    def gc_if_due(self) -> Optional[Dict[str, int]]:
+        """Run gc() if a publish marked it due (claims the marker, so one process does it)."""
+        try:
+            os.unlink(self._gc_marker())
+        except OSError:
+            return None
+        return self.gc()
+
+    def latest(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.root, "LATEST"), "r", encoding="utf-8") as f:
+                return f.read().strip() or None
+        except OSError:
+            return None
+
+    def manifest(self, run_id: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(os.path.join(self.run_dir(run_id), "manifest.json"), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _list_runs(self) -> List[str]:
+        out: List[str] = []
+        for shard in os.listdir(self.runs):
+            shard_dir = os.path.join(self.runs, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            out.extend(os.path.join(shard_dir, n) for n in os.listdir(shard_dir) if not n.startswith("."))
+        return out
+
+    # -- retention --------------------------------------------------------
+    def gc(self, keep_runs: int = DEFAULT_KEEP_RUNS, max_age_days: float = DEFAULT_MAX_AGE_DAYS) -> Dict[str, int]:
+        """Drop runs beyond the newest keep_runs or older than max_age_days (never LATEST),
+        then delete blobs referenced by no remaining manifest."""
+        latest = self.latest()
+        runs = []
+        for path in self._list_runs():
+            try:
+                runs.append((os.stat(path).st_mtime, path))
+            except OSError:
+                continue
+        runs.sort(reverse=True)
+        cutoff = time.time() - max_age_days * 86400 if max_age_days > 0 else None
+        removed_runs = 0
+        kept: List[str] = []
+        for i, (mtime, path) in enumerate(runs):
+            expired = i >= keep_runs or (cutoff is not None and mtime < cutoff)
+            if expired and os.path.basename(path) != latest:
+                shutil.rmtree(path, ignore_errors=True)
+                removed_runs += 1
+            else:
+                kept.append(path)
+        live = set()
+        for path in kept:
+            try:
+                with open(os.path.join(path, "manifest.json"), "r", encoding="utf-8") as f:
+                    live.update((json.load(f).get("files") or {}).values())
+            except (OSError, ValueError):
+                continue
+        removed_blobs = 0
+        for shard in os.listdir(self.blobs):
+            shard_dir = os.path.join(self.blobs, shard)
+            if not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if name in live or name.endswith(".tmp"):
+                    continue
+                blob = os.path.join(shard_dir, name)
+                try:
+                    if time.time() - os.stat(blob).st_mtime < BLOB_GRACE_S:
+                        continue
+                    os.unlink(blob)
+                    removed_blobs += 1
+                except OSError:
+                    pass
+        return {"runs_removed": removed_runs, "runs_kept": len(kept), "blobs_removed": removed_blobs, "blobs_live": len(live)}
+
+
+_gc_thread: Optional[threading.Thread] = None
+_gc_lock = threading.Lock()
+
+
+def collect_in_background() -> bool:
+    """Start a due gc on a daemon thread (at most one per process); call from idle loops."""
+    global _gc_thread
+    with _gc_lock:
+        if _gc_thread is not None and _gc_thread.is_alive():
+            return False
+        try:
+            store = ArtifactStore()
+        except OSError:
+            return False
+        if not os.path.exists(store._gc_marker()):
+            return False
+        _gc_thread = threading.Thread(target=store.gc_if_due, name="artifacts-gc", daemon=True)
+        _gc_thread.start()
+        return True
+
+
+def collect_detached() -> bool:
+    """Claim a due gc and run it in a detached `artifacts gc` process.
+
+    For short-lived callers (one-shot runs, scripts, the e2e harness) whose
+    interpreter may exit before a daemon thread finishes; the run never waits.
+    """
+    try:
+        store = ArtifactStore()
+        os.unlink(store._gc_marker())
+    except OSError:
+        return False
+    env = dict(os.environ, WARP_RUNTIME_DIR=os.path.dirname(store.root))
+    if os.name == "nt":
+        detach: Dict[str, Any] = {"creationflags": getattr(subprocess, "DETACHED_PROCESS", 0) | getattr(subprocess, "CREATE_NEW_PROCESS_GROUP", 0)}
+    else:
+        detach = {"start_new_session": True}
+    try:
+        subprocess.Popen([sys.executable, "-m", "orchestration", "artifacts", "gc"], cwd=ROOT, env=env,
+                         stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, close_fds=True, **detach)
+    except OSError:
+        threading.Thread(target=store.gc, name="artifacts-gc", daemon=True).start()
+    return True
@@ -0,0 +1,187 @@
+"""Per-run deadlines and cooperative cancellation.
+
+Every run gets a CancelToken built from its constraints:
+- deadline_s: seconds of budget from the start of the run
+- deadline:   absolute epoch seconds
+The runner checks the token between nodes and while waiting for approvals,
+agents check it before each model call, and provider HTTP timeouts are
+derived from the remaining budget (`token.timeout()`).
+
+Runs are cancelled from outside by runId with `request_cancel()`: tokens of
+runs in this process are flagged directly, and a flag file under
+runtime/cancel/ reaches runs in other processes sharing the runtime dir
+(queue workers, the serve daemon). A flag only cancels a run that had
+already started when it was written: a flag left for a finished or unknown
+run is removed by the next run reusing that id instead of cancelling it, and
+flags older than FLAG_TTL_S are pruned on the next request.
+
+Cancelled derives from BaseException so the broad `except Exception`
+fallbacks in steps and agents do not swallow it.
+"""
+from __future__ import annotations
+from typing import Dict, Optional
+import os
+import re
+import threading
+import time
+
+_SAFE_RUN_ID = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{0,63}$")  # leading alnum: never "." / ".." / a dotfile
+FLAG_TTL_S = 86400.0
+_tokens: Dict[str, "CancelToken"] = {}
+_tokens_lock = threading.Lock()
+
+
+def _runtime_dir() -> str:
+    root = os.path.dirname(os.path.dirname(__file__))
+    path = os.environ.get("WARP_RUNTIME_DIR") or os.path.join(root, "runtime")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def _flag_path(run_id: str) -> str:
+    return os.path.join(_runtime_dir(), "cancel", run_id)
+
+
+def valid_run_id(run_id: object) -> bool:
+    return isinstance(run_id, str) and bool(_SAFE_RUN_ID.match(run_id))
+
+
+class Cancelled(BaseException):
+    """Raised at a cancellation point; reason is "cancelled" or "deadline"."""
+
+    def __init__(self, reason: str = "cancelled"):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class CancelToken:
+    def __init__(self, run_id: str, deadline: Optional[float] = None):
+        self.run_id = run_id
+        self.deadline = deadline
+        self.started = time.time()
+        self.reason: Optional[str] = None
+        self._event = threading.Event()
+
+    @classmethod
+    def from_constraints(cls, run_id: str, constraints: Optional[Dict[str, object]]) -> "CancelToken":
+        constraints = constraints or {}
+        deadline: Optional[float] = None
+        try:
+            if constraints.get("deadline") is not None:
+                deadline = float(constraints["deadline"])  # type: ignore[arg-type]
+            if constraints.get("deadline_s") is not None:
+                rel = time.time() + float(constraints["deadline_s"])  # type: ignore[arg-type]
+                deadline = rel if deadline is None else min(deadline, rel)
+        except (TypeError, ValueError):
+            deadline = None
+        return cls(run_id, deadline)
+
+    def cancel(self, reason: str = "cancelled") -> None:
+        if self.reason is None:
+            self.reason = reason
+        self._event.set()
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left before the deadline (None when the run has no deadline)."""
+        return None if self.deadline is None else self.deadline - time.time()
+
+    def is_cancelled(self) -> bool:
+        if self._event.is_set():
+            return True
+        if self.deadline is not None and time.time() >= self.deadline:
+            self.cancel("deadline")
+            return True
+        try:
+            flagged = os.stat(_flag_path(self.run_id)).st_mtime
+        except OSError:
+            return False
+        if flagged >= self.started:
+            self.cancel("cancelled")
+            return True
+        try:  # left for an earlier run with this id
+            os.unlink(_flag_path(self.run_id))
+        except OSError:
+            pass
+        return False
+
+    def check(self) -> None:
+        if self.is_cancelled():
+            raise Cancelled(self.reason or "cancelled")
+
+    def timeout(self, default: float) -> float:
+        """Timeout for a blocking call: the default, capped by the remaining budget."""
+        self.check()
+        left = self.remaining()
+        return default if left is None else max(0.001, min(default, left))
+
+    def wait(self, seconds: float) -> bool:
+        """Sleep up to `seconds` (capped by the deadline); True if the run got cancelled."""
+        left = self.remaining()
+        step = seconds if left is None else max(0.0, min(seconds, left))
+        self._event.wait(step)
+        return self.is_cancelled()
+
+
+def register(token: CancelToken) -> None:
+    with _tokens_lock:
+        _tokens[token.run_id] = token
+
+
+def unregister(run_id: str, token: Optional[CancelToken] = None) -> None:
+    """Drop the run's token (only if it is still `token`: a re-delivered job may reuse the id)."""
+    with _tokens_lock:
+        if token is None or _tokens.get(run_id) is token:
+            _tokens.pop(run_id, None)
+    try:
+        os.unlink(_flag_path(run_id))
+    except OSError:
+        pass
+
+
+def active_runs() -> Dict[str, CancelToken]:
+    with _tokens_lock:
+        return dict(_tokens)
+
+
+def cancel_local(run_id: str, reason: str = "cancelled", started_before: Optional[float] = None) -> bool:
+    """Cancel a run only if it runs in this process (no flag file: another process may own the same id).
+
+    started_before skips a newer run that reuses the id (a re-delivered job).
+    """
+    with _tokens_lock:
+        token = _tokens.get(run_id)
+    if token is None or (started_before is not None and token.started >= started_before):
+        return False
+    token.cancel(reason)
+    return True
+
+
+def request_cancel(run_id: str, reason: str = "cancelled") -> bool:
+    """Cancel a run by id; True if it is running in this process, else a flag is left for other processes."""
+    if not valid_run_id(run_id):
+        return False
+    with _tokens_lock:
+        token = _tokens.get(run_id)
+    if token is not None:
+        token.cancel(reason)
+        return True
+    try:
+        flag_dir = os.path.dirname(_flag_path(run_id))
+        os.makedirs(flag_dir, exist_ok=True)
+        _prune_flags(flag_dir)
+        with open(_flag_path(run_id), "w", encoding="utf-8") as f:
+            f.write(reason)
+    except OSError:
+        pass
+    return False
+
+
+def _prune_flags(flag_dir: str) -> None:
+    cutoff = time.time() - FLAG_TTL_S
+    for name in os.listdir(flag_dir):
+        try:
+            path = os.path.join(flag_dir, name)
+            if os.stat(path).st_mtime < cutoff:
+                os.unlink(path)
+        except OSError:
+            pass
@@ -1,6 +1,8 @@
 from __future__ import annotations
 from dataclasses import dataclass, field
 from typing import Any, Dict, List, Optional
+import hashlib
+import json
 import os
 import re
 
@@ -17,11 +19,17 @@ class AgentConfig:
     manual_required_globs: List[str] = field(default_factory=list)
     rules: List[Dict[str, Any]] = field(default_factory=list)
     secrets: Dict[str, Any] = field(default_factory=dict)
+    approval_cache: Dict[str, Any] = field(default_factory=dict)  # {scope, ttl_s}; see orchestration.approvals
+
+
+# AgentConfig fields that decide which actions need approval (approval_cache and secrets do not)
+POLICY_FIELDS = ("default_action", "auto_apply_globs", "manual_required_globs", "rules")
 
 
 def _fallback_parse(text: str) -> AgentConfig:
     auto: List[str] = []
     manual: List[str] = []
+    cache: Dict[str, Any] = {}
     section = None
     for line in text.splitlines():
         s = line.strip()
@@ -29,13 +37,20 @@ def _fallback_parse(text: str) -> AgentConfig:
             section = "auto"
         elif s.startswith("manual_required_globs:"):
             section = "manual"
+        elif s.startswith("cache:"):
+            section = "cache"
+            inline = re.findall(r"(\w+):\s*([\w.]+)", s[len("cache:"):])  # cache: {scope: session, ttl_s: 3600}
+            cache.update({k: v for k, v in inline})
+        elif section == "cache" and re.match(r"^(scope|ttl_s):\s*\S+", s):
+            key, _, val = s.partition(":")
+            cache[key.strip()] = val.split("#")[0].strip().strip('"')
         elif re.match(r"^-\s+\"?.+\"?$", s):
             val = s.lstrip("- ").strip().strip('"')
             if section == "auto":
                 auto.append(val)
             elif section == "manual":
                 manual.append(val)
-    return AgentConfig(auto_apply_globs=auto, manual_required_globs=manual)
+    return AgentConfig(auto_apply_globs=auto, manual_required_globs=manual, approval_cache=cache)
 
 
 def load_agent_config(root: Optional[str] = None) -> AgentConfig:
@@ -56,9 +71,17 @@ def load_agent_config(root: Optional[str] = None) -> AgentConfig:
                 auto_apply_globs=list(approval.get("auto_apply_globs", []) or []),
                 manual_required_globs=list(approval.get("manual_required_globs", []) or []),
                 rules=list(approval.get("rules", []) or []),
+                approval_cache=dict(approval.get("cache", {}) or {}),
                 secrets=data.get("secrets", {}) or {},
             )
         except Exception:
             # Fall back to regex
             return _fallback_parse(text)
     return _fallback_parse(text)
+
+
+def policy_version(cfg: Any) -> str:
+    """Stable short hash of the approval policy (AgentConfig or its __dict__); POLICY_FIELDS only."""
+    data = cfg.__dict__ if isinstance(cfg, AgentConfig) else (cfg or {})
+    raw = json.dumps({k: data.get(k) for k in POLICY_FIELDS}, sort_keys=True, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:16]
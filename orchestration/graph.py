@@ -8,10 +8,15 @@ import os
 import json
 import shutil
 import fnmatch
+import threading
 import time
 
+from .artifacts import ArtifactStore, collect_detached, collect_in_background
+from .cancel import Cancelled, CancelToken, register, unregister, valid_run_id
 from .config import load_agent_config
-from .logging import log_event
+from .logging import add_listener, log_event, remove_listener
+from . import approvals as approval_cache
+from . import memo
 
 
 def _read_approval_mode() -> bool:
@@ -35,7 +40,7 @@ except Exception:  # pragma: no cover
 
 def _runtime_dir() -> str:
     root = os.path.dirname(os.path.dirname(__file__))
-    path = os.path.join(root, "runtime")
+    path = os.environ.get("WARP_RUNTIME_DIR") or os.path.join(root, "runtime")
     os.makedirs(path, exist_ok=True)
     return path
 
@@ -65,6 +70,10 @@ from .steps.execution import execute_step  # noqa: E402
 from .steps.validation import validate_step  # noqa: E402
 
 
+# Terminal statuses for runs stopped through their CancelToken
+CANCEL_STATUS = {"cancelled": "cancelled", "deadline": "deadline_exceeded", "lease_lost": "lease_lost"}
+
+
 class _SimpleRunner:  # minimal shim with invoke() to mirror LangGraph compiled graphs
     def __init__(self, retries: int = 1):
         self._nodes = [plan_step, execute_step, validate_step]
@@ -105,29 +114,87 @@ class _SimpleRunner:  # minimal shim with invoke() to mirror LangGraph compiled
                                     if action_id in pending:
                                         pending.discard(action_id)
                                     log_event("approval_consumed", {"runId": state.get("runId"), "actionId": action_id})
-                                    if approve_all_on_any or not pending:
+                                    approved = approve_all_on_any or not pending
+                                    if approved:
                                         state["status"] = "approved"
+                                    try:
+                                        # Best effort: the grant is already consumed, caching it must not undo that
+                                        self._remember_approval(state, action_id, data)
+                                    except Exception as e:
+                                        log_event("approval_record_failed", {"runId": state.get("runId"), "actionId": action_id}, status="error", error=str(e))
+                                    if approved:
                                         return
             except Exception:
                 pass
-            time.sleep(1.0)
+            token = state.get("cancel")
+            if token is not None:
+                if token.wait(1.0):
+                    raise Cancelled(token.reason or "cancelled")
+            else:
+                time.sleep(1.0)
         # timeout
         log_event("error", {"reason": "approval_timeout", "pending": list(pending)}, status="error")
         state["status"] = "failed"
 
+    @staticmethod
+    def _remember_approval(state: Dict[str, Any], action_id: Optional[str], grant: Dict[str, Any]) -> None:
+        """Store a consumed approval in the decision cache (scope/ttl_s from the grant or agent config)."""
+        entry = next((a for a in state.get("approvals") or [] if action_id and a.get("actionId") == action_id), None)
+        if entry is None or not entry.get("fingerprint"):
+            return
+        opts = approval_cache.defaults(state.get("config"))
+        ttl_s = approval_cache.ttl_seconds(grant.get("ttl_s", opts["ttl_s"]), opts["ttl_s"])
+        approval_cache.record(
+            entry["fingerprint"], str(grant.get("scope") or opts["scope"]), ttl_s,
+            run_id=state.get("runId"), session_id=approval_cache.session_of(state), granted_by=grant.get("by"),
+            cmd=entry.get("cmd"), paths=entry.get("paths"), policy=entry.get("policy", ""), revision=entry.get("revision", ""),
+        )
+
+    def _run_node(self, fn, state: Dict[str, Any]) -> Dict[str, Any]:
+        """Run a node, reusing its memoized output when the input fingerprint matches."""
+        node = fn.__name__
+        fp = memo.fingerprint(node, state)
+        if fp and not memo.is_forced(node, state):
+            cached = memo.lookup(node, fp)
+            if cached is not None:
+                log_event("cache_hit", {"node": node, "fingerprint": fp, "runId": state.get("runId")}, phase=node)
+                return memo.apply_cached(state, node, fp, cached)
+        context_before = dict(state.get("context") or {})
+        updates = fn(state)
+        token = state.get("cancel")
+        if token is not None:
+            token.check()  # output degraded by a cancel/deadline mid-node must not be memoized
+        if fp:
+            memo.store(node, fp, updates or {}, context_before=context_before)
+        return updates
+
+    def _cancelled(self, state: Dict[str, Any], reason: str, node: str) -> Dict[str, Any]:
+        token = state.get("cancel")
+        state["status"] = CANCEL_STATUS.get(reason, "cancelled")
+        elapsed_ms = round((time.time() - token.started) * 1000.0, 1) if token is not None else None
+        log_event("run_cancelled", {"runId": state.get("runId"), "reason": reason, "node": node, "elapsed_ms": elapsed_ms}, phase=node, status=state["status"])
+        return state
+
     def invoke(self, state: Dict[str, Any]) -> Dict[str, Any]:
+        token = state.get("cancel")
         for fn in self._nodes:
             attempt = 0
             while True:
                 try:
-                    updates = fn(state)
+                    if token is not None:
+                        token.check()
+                    updates = self._run_node(fn, state)
                     state.update(updates or {})
                     log_event("transition", {"node": fn.__name__, "runId": state.get("runId")}, phase=fn.__name__, status=state.get("status"))
                     # pause for approvals after execution phase
                     if fn is execute_step and state.get("status") == "awaiting_approval":
                         self._await_approvals(state)
                     break
+                except Cancelled as c:
+                    return self._cancelled(state, c.reason, fn.__name__)
                 except Exception as e:  # guard + retry
+                    if token is not None and token.is_cancelled():  # e.g. provider call cut off by the deadline
+                        return self._cancelled(state, token.reason or "cancelled", fn.__name__)
                     attempt += 1
                     log_event("error", {"node": fn.__name__, "runId": state.get("runId")}, phase=fn.__name__, status="error", error=str(e))
                     if attempt > self._retries:
@@ -154,14 +221,56 @@ def build_graph(retries: int = 1):
     return _SimpleRunner(retries=retries)
 
 
-def run_goal(goal: str, constraints: Optional[Dict[str, Any]] = None, context: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
-    cfg = load_agent_config(os.path.dirname(os.path.dirname(__file__)))
+def _write_artifacts(state: Dict[str, Any], events: List[Dict[str, Any]]) -> Optional[str]:
+    """Publish the run's outputs under runtime/artifacts/runs/<runId> (Pattern 1 output artifact).
+
+    plan.json/actions.json omit per-run action ids so identical plans and
+    action sets dedupe in the blob store; runtime/plan.md mirrors the latest run.
+    """
+    try:
+        payload = {
+            "goal": state.get("goal"),
+            "plan": state.get("plan", []),
+            "actions": state.get("actions", {}),
+            "validation": state.get("validation", {}),
+        }
+        plan_md = ("# Plan\n\n" + json.dumps(payload, indent=2)).encode("utf-8")
+        files = {
+            "plan.md": plan_md,
+            "plan.json": json.dumps(state.get("plan", []), indent=2, sort_keys=True).encode("utf-8"),
+            "actions.json": json.dumps(memo.without_ids(state.get("actions", {})), indent=2, sort_keys=True).encode("utf-8"),
+            "events.jsonl": "".join(json.dumps(ev, ensure_ascii=False) + "\n" for ev in events).encode("utf-8"),
+        }
+        run_id = str(state.get("runId"))
+        out = ArtifactStore().write_run(run_id, files, meta={"goal": state.get("goal"), "status": state.get("status")})
+        # Back-compat for the dashboard (/api/artifact/plan reads runtime/plan.md)
+        latest = os.path.join(_runtime_dir(), "plan.md")
+        tmp = f"{latest}.{os.getpid()}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(plan_md)
+        os.replace(tmp, latest)
+        return out
+    except Exception:
+        return None
+
+
+def run_goal(goal: str, constraints: Optional[Dict[str, Any]] = None, context: Optional[Dict[str, Any]] = None, warm: Optional[Any] = None) -> Dict[str, Any]:
+    """Run plan -> execute -> validate for a goal.
+
+    `warm` is an optional WarmContext (see orchestration.warm) supplying a
+    pre-loaded config, model router and git listing; one-shot callers omit it.
+    constraints.deadline_s / constraints.deadline bound the whole run, and
+    constraints.runId pre-assigns the id so callers can cancel it
+    (orchestration.cancel.request_cancel) before the result comes back.
+    """
+    cfg = warm.config if warm is not None else load_agent_config(os.path.dirname(os.path.dirname(__file__)))
     retries = int((constraints or {}).get("retries", 1))
     if constraints is None:
         constraints = {}
     if "approval_strict" not in constraints:
         constraints["approval_strict"] = _read_approval_mode()
-    run_id = str(os.urandom(8).hex())
+    run_id = constraints["runId"] if valid_run_id(constraints.get("runId")) else str(os.urandom(8).hex())
+    token = CancelToken.from_constraints(run_id, constraints)
     state: Dict[str, Any] = {
         "goal": goal,
         "constraints": constraints or {},
@@ -175,13 +284,42 @@ def run_goal(goal: str, constraints: Optional[Dict[str, Any]] = None, context: O
         "history": [],
         "runId": run_id,
     }
-    log_event("start", {"goal": goal, "retries": retries, "runId": run_id})
-    engine = build_graph(retries=retries)
+    if warm is not None:
+        state["warm"] = warm
+    state["cancel"] = token
+    events: List[Dict[str, Any]] = []
+    ident = threading.get_ident()
+
+    def _capture(ev: Dict[str, Any]) -> None:
+        if threading.get_ident() == ident:
+            events.append(ev)
+
+    add_listener(_capture)
+    register(token)
     try:
-        result = engine.invoke(state)
-    except Exception as e:
-        log_event("error", {"stage": "engine", "runId": run_id}, status="failed", error=str(e))
-        state["status"] = "failed"
-        result = state
-    log_event("end", {"status": result.get("status"), "runId": run_id})
+        log_event("start", {"goal": goal, "retries": retries, "runId": run_id, "deadline": token.deadline})
+        engine = build_graph(retries=retries)
+        try:
+            result = engine.invoke(state)
+        except Cancelled as c:  # LangGraph engine: cancellation surfaces here
+            result = _SimpleRunner()._cancelled(state, c.reason, "engine")
+        except Exception as e:
+            log_event("error", {"stage": "engine", "runId": run_id}, status="failed", error=str(e))
+            state["status"] = "failed"
+            result = state
+        log_event("end", {"status": result.get("status"), "runId": run_id})
+    finally:
+        unregister(run_id, token)
+        remove_listener(_capture)
+    result.pop("warm", None)
+    result.pop("cancel", None)
+    result["artifacts"] = _write_artifacts(result, events)
+    try:
+        # A publish may have marked gc due: long-lived callers collect on a thread, one-shot ones detach it
+        if warm is not None:
+            collect_in_background()
+        else:
+            collect_detached()
+    except Exception:
+        pass
     return result
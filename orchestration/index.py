@@ -0,0 +1,416 @@
+"""Incremental, memory-mapped trigram index over git-tracked files (Pattern 3).
+
+Each file is indexed as "<path>\\n<content>" (lowercased bytes) so path names
+match too. Postings live in immutable segment files that are mmapped for
+queries; an update only reads files whose (size, mtime) signature changed,
+writes them to a new segment and tombstones their previous doc ids (also for
+tracked files missing from the working tree). Given the HEAD commit, an
+update stats only files git reports as different from the commit the index
+was last brought up to date at (plus files that were dirty then and new
+paths), instead of every tracked file; without one, every file is stat'ed. Segments
+are merged (ids renumbered, tombstones dropped) once there are more than
+MAX_SEGMENTS or tombstones exceed a third of the docs.
+
+Segment layout (little-endian):
+  b"TRG1" | n_keys u32 | n_keys x (trigram u32, offset u32, count u32) sorted by trigram
+  | postings (doc id u32, ascending per trigram)
+
+runtime/index/meta.json holds the doc table [[path, signature] | null, ...],
+the active segment list and the git base (head commit, paths dirty against
+it); it is replaced atomically after segments land.
+"""
+from __future__ import annotations
+from array import array
+from bisect import bisect_left
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+import json
+import math
+import mmap
+import os
+import re
+import struct
+import subprocess
+import sys
+import threading
+import time
+
+try:
+    import fcntl  # type: ignore
+except Exception:  # pragma: no cover - Windows
+    fcntl = None  # type: ignore
+
+MAGIC = b"TRG1"
+_HEADER = struct.Struct("<4sI")
+_ENTRY = struct.Struct("<III")
+MAX_FILE_BYTES = 512 * 1024
+MAX_SEGMENTS = 4
+_WORD = re.compile(r"[a-z0-9_][a-z0-9_.\-]{2,}")
+_STOPWORDS = {"the", "and", "for", "with", "from", "into", "that", "this", "all", "are", "our", "use", "add", "make", "run"}
+
+
+def _runtime_dir() -> str:
+    root = os.path.dirname(os.path.dirname(__file__))
+    path = os.environ.get("WARP_RUNTIME_DIR") or os.path.join(root, "runtime")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def git_head(root: str) -> Optional[str]:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "-q", "--verify", "HEAD"], cwd=root, text=True, stderr=subprocess.DEVNULL).strip() or None
+    except Exception:
+        return None
+
+
+def _git_changed(root: str, since: str) -> Optional[Set[str]]:
+    """Tracked paths whose working-tree content differs from commit `since` (None if git fails)."""
+    try:
+        out = subprocess.check_output(["git", "--no-pager", "diff", "--name-only", "--no-renames", "-z", since, "--"], cwd=root, stderr=subprocess.DEVNULL)
+    except Exception:
+        return None
+    return {p for p in out.decode("utf-8", "surrogateescape").split("\0") if p}
+
+
+def _trigrams(data: bytes) -> Set[int]:
+    return {int.from_bytes(data[i:i + 3], "big") for i in range(len(data) - 2)}
+
+
+def _u32(buf: bytes) -> array:
+    a = array("I")
+    a.frombytes(buf)
+    if sys.byteorder != "little":  # pragma: no cover
+        a.byteswap()
+    return a
+
+
+def _contains(ids: array, value: int) -> bool:
+    i = bisect_left(ids, value)
+    return i < len(ids) and ids[i] == value
+
+
+@dataclass
+class Hit:
+    path: str
+    score: float
+    snippets: List[Tuple[int, str]] = field(default_factory=list)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"path": self.path, "score": round(self.score, 3), "snippets": [{"line": n, "text": t} for n, t in self.snippets]}
+
+
+class _Segment:
+    def __init__(self, path: str):
+        self.path = path
+        self._f = open(path, "rb")
+        self._mm = mmap.mmap(self._f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.n = _HEADER.unpack_from(self._mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"not a trigram segment: {path}")
+        self._table = _HEADER.size
+        self._postings = self._table + self.n * _ENTRY.size
+
+    def _find(self, key: int) -> Tuple[int, int]:
+        lo, hi = 0, self.n
+        while lo < hi:
+            mid = (lo + hi) // 2
+            k, off, cnt = _ENTRY.unpack_from(self._mm, self._table + mid * _ENTRY.size)
+            if k < key:
+                lo = mid + 1
+            elif k > key:
+                hi = mid
+            else:
+                return off, cnt
+        return 0, 0
+
+    def count(self, key: int) -> int:
+        return self._find(key)[1]
+
+    def lookup(self, key: int) -> array:
+        off, cnt = self._find(key)
+        start = self._postings + off * 4
+        return _u32(self._mm[start:start + cnt * 4])
+
+    def items(self) -> Iterable[Tuple[int, array]]:
+        for i in range(self.n):
+            k, off, cnt = _ENTRY.unpack_from(self._mm, self._table + i * _ENTRY.size)
+            start = self._postings + off * 4
+            yield k, _u32(self._mm[start:start + cnt * 4])
+
+    def close(self) -> None:
+        try:
+            self._mm.close()
+            self._f.close()
+        except Exception:
+            pass
+
+
+def _write_segment(path: str, postings: Dict[int, List[int]]) -> int:
+    keys = sorted(postings)
+    table = bytearray()
+    body = array("I")
+    for k in keys:
+        ids = postings[k]
+        table += _ENTRY.pack(k, len(body), len(ids))
+        body.extend(ids)
+    if sys.byteorder != "little":  # pragma: no cover
+        body.byteswap()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(MAGIC, len(keys)))
+        f.write(table)
+        f.write(body.tobytes())
+    os.replace(tmp, path)
+    return os.path.getsize(path)
+
+
+class TrigramIndex:
+    def __init__(self, repo_root: Optional[str] = None, index_dir: Optional[str] = None):
+        self.repo_root = repo_root or os.path.dirname(os.path.dirname(__file__))
+        self.dir = index_dir or os.path.join(_runtime_dir(), "index")
+        os.makedirs(self.dir, exist_ok=True)
+        self.docs: List[Optional[List[str]]] = []
+        self.segment_names: List[str] = []
+        self.head: Optional[str] = None
+        self.dirty: List[str] = []
+        self._segments: List[_Segment] = []
+        self.live_docs = 0
+        self._lock = threading.RLock()  # one instance is shared by warm-daemon threads
+        self.last_build: Dict[str, Any] = {}
+        self._load()
+
+    # -- persistence ------------------------------------------------------
+    def _load(self) -> None:
+        for seg in self._segments:
+            seg.close()
+        self._segments = []
+        try:
+            with open(os.path.join(self.dir, "meta.json"), "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            self.docs = meta.get("docs") or []
+            self.segment_names = meta.get("segments") or []
+            self.head, self.dirty = meta.get("head"), meta.get("dirty") or []
+            self._segments = [_Segment(os.path.join(self.dir, n)) for n in self.segment_names]
+        except Exception:
+            self.docs, self.segment_names, self._segments = [], [], []
+            self.head, self.dirty = None, []
+        self.live_docs = sum(1 for d in self.docs if d)
+
+    def _save_meta(self) -> None:
+        path = os.path.join(self.dir, "meta.json")
+        tmp = f"{path}.{os.getpid()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "docs": self.docs, "segments": self.segment_names, "head": self.head, "dirty": self.dirty}, f)
+        os.replace(tmp, path)
+
+    def _cleanup(self) -> None:
+        live = set(self.segment_names) | {"meta.json", ".lock"}
+        for name in os.listdir(self.dir):
+            if name not in live and not name.endswith(".tmp"):
+                try:
+                    os.unlink(os.path.join(self.dir, name))
+                except OSError:
+                    pass
+
+    def size_bytes(self) -> int:
+        total = 0
+        for name in self.segment_names + ["meta.json"]:
+            try:
+                total += os.path.getsize(os.path.join(self.dir, name))
+            except OSError:
+                pass
+        return total
+
+    # -- build ------------------------------------------------------------
+    def _signature(self, path: str) -> Optional[str]:
+        try:
+            st = os.stat(os.path.join(self.repo_root, path))
+        except OSError:
+            return None
+        return f"{st.st_size}:{st.st_mtime_ns}"
+
+    def _read(self, path: str) -> Optional[bytes]:
+        try:
+            with open(os.path.join(self.repo_root, path), "rb") as f:
+                data = f.read(MAX_FILE_BYTES)
+        except OSError:
+            return None
+        if b"\0" in data[:8192]:
+            return None  # binary
+        return (path + "\n").encode("utf-8", "replace").lower() + data.lower()
+
+    def update(self, paths: List[str], head: Optional[str] = None) -> Dict[str, Any]:
+        """Bring the index in line with `paths` (tracked files); only changed files are read.
+
+        With `head` (the HEAD commit), only files git reports as changed are stat'ed.
+        """
+        t0 = time.perf_counter()
+        with self._lock:
+            return self._update(paths, head, t0)
+
+    def _candidates(self, paths: List[str], current: Dict[str, Tuple[int, str]], head: Optional[str]) -> Tuple[List[str], List[str], bool]:
+        """(paths to stat, paths dirty against head, full scan?)."""
+        changed = _git_changed(self.repo_root, self.head) if head and self.head else None
+        if changed is None:  # no base yet, no head or git failed: stat everything
+            dirty = _git_changed(self.repo_root, head) if head else None
+            return paths, sorted(dirty or []), True
+        dirty = changed if head == self.head else _git_changed(self.repo_root, head)
+        maybe = changed | set(self.dirty)
+        return [p for p in paths if p in maybe or p not in current], sorted(dirty or []), False
+
+    def _update(self, paths: List[str], head: Optional[str], t0: float) -> Dict[str, Any]:
+        lock = open(os.path.join(self.dir, ".lock"), "a+")
+        try:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            self._load()  # another process may have updated meantime
+            current = {d[0]: (i, d[1]) for i, d in enumerate(self.docs) if d}
+            wanted = set(paths)
+            changed = 0
+            removed = 0
+            postings: Dict[int, List[int]] = {}
+            scan, dirty, full = self._candidates(paths, current, head)
+            for path in scan:
+                sig = self._signature(path)
+                prev = current.get(path)
+                if sig is None:  # tracked but missing from the working tree
+                    if prev is not None and self.docs[prev[0]] is not None:
+                        self.docs[prev[0]] = None
+                        removed += 1
+                    continue
+                if prev is not None and prev[1] == sig:
+                    continue
+                if prev is not None:
+                    self.docs[prev[0]] = None
+                data = self._read(path)
+                doc_id = len(self.docs)
+                self.docs.append([path, sig])
+                changed += 1
+                if data is None:
+                    continue
+                for tri in _trigrams(data):
+                    postings.setdefault(tri, []).append(doc_id)
+            for path, (doc_id, _) in current.items():
+                if path not in wanted and self.docs[doc_id] is not None:
+                    self.docs[doc_id] = None
+                    removed += 1
+            if postings:
+                name = f"seg-{time.time_ns():x}.bin"
+                _write_segment(os.path.join(self.dir, name), postings)
+                self.segment_names.append(name)
+            live = sum(1 for d in self.docs if d)
+            tombstones = len(self.docs) - live
+            compacted = False
+            if len(self.segment_names) > MAX_SEGMENTS or (self.docs and tombstones * 3 > len(self.docs)):
+                self._segments = [_Segment(os.path.join(self.dir, n)) for n in self.segment_names]
+                self._compact()
+                compacted = True
+            base_moved = (head, dirty) != (self.head, self.dirty)
+            self.head, self.dirty = head, dirty
+            if changed or removed or compacted or base_moved:
+                self._save_meta()
+                self._cleanup()
+            self._load()
+        finally:
+            if fcntl is not None:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+            lock.close()
+        self.last_build = {
+            "build_ms": round((time.perf_counter() - t0) * 1000.0, 2),
+            "files": self.live_docs,
+            "changed": changed,
+            "removed": removed,
+            "scanned": len(scan),
+            "full_scan": full,
+            "segments": len(self.segment_names),
+            "index_bytes": self.size_bytes(),
+        }
+        return self.last_build
+
+    def _compact(self) -> None:
+        remap: Dict[int, int] = {}
+        docs: List[Optional[List[str]]] = []
+        for old_id, d in enumerate(self.docs):
+            if d:
+                remap[old_id] = len(docs)
+                docs.append(d)
+        merged: Dict[int, List[int]] = {}
+        for seg in self._segments:
+            for key, ids in seg.items():
+                kept = [remap[i] for i in ids if i in remap]
+                if kept:
+                    merged.setdefault(key, []).extend(kept)
+        for ids in merged.values():
+            ids.sort()
+        name = f"seg-{time.time_ns():x}.bin"
+        _write_segment(os.path.join(self.dir, name), merged)
+        for seg in self._segments:
+            seg.close()
+        self._segments = []
+        self.docs = docs
+        self.segment_names = [name]
+
+    # -- query ------------------------------------------------------------
+    def _docs_with(self, term: bytes) -> Set[int]:
+        """Docs containing every trigram of term: intersect rarest-first, probing long lists by bisection."""
+        keys = _trigrams(term)
+        result: Set[int] = set()
+        for seg in self._segments:
+            counts = sorted((seg.count(k), k) for k in keys)
+            if not counts or counts[0][0] == 0:
+                continue
+            cands = set(seg.lookup(counts[0][1]))
+            for cnt, key in counts[1:]:
+                ids = seg.lookup(key)
+                if cnt > 8 * len(cands):
+                    cands = {i for i in cands if _contains(ids, i)}
+                else:
+                    cands &= set(ids)
+                if not cands:
+                    break
+            result |= cands
+        return {i for i in result if i < len(self.docs) and self.docs[i]}
+
+    def search(self, query: str, k: int = 8, snippets: int = 2) -> List[Hit]:
+        with self._lock:
+            return self._search(query, k, snippets)
+
+    def _search(self, query: str, k: int, snippets: int) -> List[Hit]:
+        terms = [t for t in dict.fromkeys(_WORD.findall(query.lower())) if t not in _STOPWORDS]
+        if not terms or not self._segments:
+            return []
+        n_docs = max(1, self.live_docs)
+        scores: Dict[int, float] = {}
+        for term in terms:
+            ids = self._docs_with(term.encode("utf-8"))
+            if not ids:
+                continue
+            idf = math.log(1.0 + n_docs / len(ids))
+            for i in ids:
+                path = self.docs[i][0].lower()  # type: ignore[index]
+                scores[i] = scores.get(i, 0.0) + idf * (3.0 if term in path else 1.0)
+        top = sorted(scores.items(), key=lambda kv: (-kv[1], self.docs[kv[0]][0]))[:k]  # type: ignore[index]
+        return [Hit(self.docs[i][0], s, self._snippets(self.docs[i][0], terms, snippets)) for i, s in top]  # type: ignore[index]
+
+    def _snippets(self, path: str, terms: List[str], limit: int) -> List[Tuple[int, str]]:
+        if limit <= 0:
+            return []
+        out: List[Tuple[int, str]] = []
+        try:
+            with open(os.path.join(self.repo_root, path), "r", encoding="utf-8", errors="replace") as f:
+                for n, line in enumerate(f, 1):
+                    low = line.lower()
+                    if any(t in low for t in terms):
+                        out.append((n, line.strip()[:160]))
+                        if len(out) >= limit:
+                            break
+                    if n > 5000:
+                        break
+        except OSError:
+            pass
+        return out
+
+    def close(self) -> None:
+        for seg in self._segments:
+            seg.close()
+        self._segments = []
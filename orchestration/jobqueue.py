@@ -0,0 +1,277 @@
+"""Durable SQLite job queue for spreading run_goal across processes and hosts.
+
+Any process that can open runtime/jobs.sqlite3 (including over a shared
+filesystem mount) can enqueue goals or run `python -m orchestration worker`.
+Workers claim jobs under a lease and extend it with heartbeats while the run
+is in flight; a job whose lease expires (worker crashed or lost its mount) is
+re-delivered to another worker until max_attempts is reached. A failed
+heartbeat (e.g. "database is locked" on a shared mount) is retried until the
+lease runs out; a worker that loses its lease cancels its own run (status
+lease_lost) and leaves the job to the re-delivery instead of finishing it twice. Higher priority
+jobs are claimed first, FIFO within a priority. Results are stored per job.
+
+The database uses the rollback journal (not WAL) because WAL needs shared
+memory that network filesystems do not provide; every claim is a short
+BEGIN IMMEDIATE transaction.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional
+import contextlib
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import uuid
+
+from .artifacts import collect_in_background
+from .cancel import cancel_local
+from .logging import log_event
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    goal TEXT NOT NULL,
+    constraints TEXT NOT NULL DEFAULT '{}',
+    context TEXT NOT NULL DEFAULT '{}',
+    priority INTEGER NOT NULL DEFAULT 0,
+    status TEXT NOT NULL DEFAULT 'queued',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    max_attempts INTEGER NOT NULL DEFAULT 3,
+    worker TEXT,
+    lease_until REAL,
+    created REAL NOT NULL,
+    updated REAL NOT NULL,
+    result TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, priority DESC, created);
+"""
+
+
+def _runtime_dir() -> str:
+    root = os.path.dirname(os.path.dirname(__file__))
+    path = os.environ.get("WARP_RUNTIME_DIR") or os.path.join(root, "runtime")
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+@dataclass
+class Job:
+    id: str
+    goal: str
+    constraints: Dict[str, Any]
+    context: Dict[str, Any]
+    priority: int
+    status: str
+    attempts: int
+    max_attempts: int
+    worker: Optional[str] = None
+    lease_until: Optional[float] = None
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+    @classmethod
+    def from_row(cls, row: sqlite3.Row) -> "Job":
+        return cls(
+            id=row["id"],
+            goal=row["goal"],
+            constraints=json.loads(row["constraints"] or "{}"),
+            context=json.loads(row["context"] or "{}"),
+            priority=row["priority"],
+            status=row["status"],
+            attempts=row["attempts"],
+            max_attempts=row["max_attempts"],
+            worker=row["worker"],
+            lease_until=row["lease_until"],
+            result=json.loads(row["result"]) if row["result"] else None,
+            error=row["error"],
+        )
+
+
+class JobQueue:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or os.environ.get("WARP_JOBS_DB") or os.path.join(_runtime_dir(), "jobs.sqlite3")
+        with self._connect() as db:
+            db.executescript(_SCHEMA)
+
+    @contextlib.contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Autocommit connection per operation: nothing holds a lock between calls
+        db = sqlite3.connect(self.path, timeout=30.0, isolation_level=None)
+        try:
+            db.row_factory = sqlite3.Row
+            db.execute("PRAGMA busy_timeout = 30000")
+            yield db
+        finally:
+            db.close()
+
+    def enqueue(self, goal: str, constraints: Optional[Dict[str, Any]] = None, context: Optional[Dict[str, Any]] = None, priority: int = 0, max_attempts: int = 3) -> str:
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, goal, constraints, context, priority, max_attempts, created, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, goal, json.dumps(constraints or {}), json.dumps(context or {}), int(priority), int(max_attempts), now, now),
+            )
+        log_event("job_enqueued", {"jobId": job_id, "priority": priority})
+        return job_id
+
+    def _expire_leases(self, db: sqlite3.Connection, now: float) -> None:
+        rows = db.execute("SELECT id, attempts, max_attempts, worker FROM jobs WHERE status = 'running' AND lease_until < ?", (now,)).fetchall()
+        for row in rows:
+            if row["attempts"] >= row["max_attempts"]:
+                db.execute("UPDATE jobs SET status = 'failed', error = 'lease expired', worker = NULL, lease_until = NULL, updated = ? WHERE id = ?", (now, row["id"]))
+            else:
+                db.execute("UPDATE jobs SET status = 'queued', worker = NULL, lease_until = NULL, updated = ? WHERE id = ?", (now, row["id"]))
+            log_event("job_redelivered" if row["attempts"] < row["max_attempts"] else "job_failed", {"jobId": row["id"], "worker": row["worker"], "reason": "lease expired"})
+
+    def claim(self, worker: str, lease_s: float = 60.0) -> Optional[Job]:
+        now = time.time()
+        with self._connect() as db:
+            db.execute("BEGIN IMMEDIATE")
+            try:
+                self._expire_leases(db, now)
+                row = db.execute("SELECT * FROM jobs WHERE status = 'queued' ORDER BY priority DESC, created LIMIT 1").fetchone()
+                if row is None:
+                    db.execute("COMMIT")
+                    return None
+                db.execute(
+                    "UPDATE jobs SET status = 'running', attempts = attempts + 1, worker = ?, lease_until = ?, updated = ? WHERE id = ?",
+                    (worker, now + lease_s, now, row["id"]),
+                )
+                job = Job.from_row(db.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone())
+                db.execute("COMMIT")
+            except Exception:
+                db.execute("ROLLBACK")
+                raise
+        log_event("job_claimed", {"jobId": job.id, "worker": worker, "attempt": job.attempts})
+        return job
+
+    def heartbeat(self, job_id: str, worker: str, lease_s: float = 60.0) -> bool:
+        """Extend the lease; False means the job was re-delivered and this worker lost it."""
+        with self._connect() as db:
+            cur = db.execute(
+                "UPDATE jobs SET lease_until = ?, updated = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (time.time() + lease_s, time.time(), job_id, worker),
+            )
+            return cur.rowcount == 1
+
+    def complete(self, job_id: str, worker: str, result: Dict[str, Any]) -> bool:
+        with self._connect() as db:
+            cur = db.execute(
+                "UPDATE jobs SET status = 'done', result = ?, worker = NULL, lease_until = NULL, updated = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (json.dumps(result, ensure_ascii=False, default=str), time.time(), job_id, worker),
+            )
+        ok = cur.rowcount == 1
+        log_event("job_completed", {"jobId": job_id, "worker": worker, "status": result.get("status"), "stale": not ok})
+        return ok
+
+    def fail(self, job_id: str, worker: str, error: str) -> None:
+        with self._connect() as db:
+            db.execute(
+                "UPDATE jobs SET status = CASE WHEN attempts >= max_attempts THEN 'failed' ELSE 'queued' END, "
+                "error = ?, worker = NULL, lease_until = NULL, updated = ? WHERE id = ? AND worker = ? AND status = 'running'",
+                (error, time.time(), job_id, worker),
+            )
+        log_event("job_failed", {"jobId": job_id, "worker": worker}, status="error", error=error)
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._connect() as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return Job.from_row(row) if row else None
+
+    def counts(self) -> Dict[str, int]:
+        with self._connect() as db:
+            return {r["status"]: r["n"] for r in db.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status")}
+
+
+def default_worker_id(index: int = 0) -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{index}"
+
+
+def run_worker(queue: JobQueue, worker: Optional[str] = None, lease_s: float = 60.0, poll_s: float = 1.0, max_jobs: Optional[int] = None, exit_when_idle: bool = False, stop: Optional[threading.Event] = None, warm: Optional[Any] = None) -> int:
+    """Claim and run jobs until stopped; return the number of jobs processed."""
+    from .graph import run_goal
+
+    worker = worker or default_worker_id()
+    stop = stop or threading.Event()
+    done = 0
+    while not stop.is_set() and (max_jobs is None or done < max_jobs):
+        job = queue.claim(worker, lease_s)
+        if job is None:
+            if exit_when_idle:
+                break
+            collect_in_background()
+            stop.wait(poll_s)
+            continue
+        constraints = {"runId": job.id, **job.constraints, "jobId": job.id}  # `cancel <jobId>` reaches the run
+        finished = threading.Event()
+        lost = threading.Event()
+
+        def _beat(job: Job = job, run_id: str = str(constraints["runId"])) -> None:
+            lease_until = job.lease_until or time.time() + lease_s  # never later than the stored lease
+            interval = lease_s / 3.0
+            while not finished.wait(interval):
+                t0 = time.time()
+                try:
+                    held = queue.heartbeat(job.id, worker, lease_s)
+                except Exception as e:
+                    if time.time() < lease_until:  # transient (locked/busy db): retry sooner while the lease holds
+                        interval = max(0.05, min(lease_s / 3.0, (lease_until - time.time()) / 4.0))
+                        log_event("job_heartbeat_retry", {"jobId": job.id, "worker": worker, "lease_left_s": round(lease_until - time.time(), 2)}, status="error", error=str(e))
+                        continue
+                    held = False
+                if held:
+                    lease_until, interval = t0 + lease_s, lease_s / 3.0
+                    continue
+                lost.set()
+                log_event("job_lease_lost", {"jobId": job.id, "worker": worker, "attempt": job.attempts}, status="error")
+                cancel_local(run_id, "lease_lost", started_before=lease_until)
+                return
+
+        beat = threading.Thread(target=_beat, name=f"heartbeat-{job.id[:8]}", daemon=True)
+        beat.start()
+        try:
+            if warm is not None:
+                warm.refresh()
+            result = run_goal(job.goal, constraints=constraints, context=job.context, warm=warm)
+            if not lost.is_set():  # else the job is re-delivered; its next attempt stores the result
+                queue.complete(job.id, worker, result)
+        except Exception as e:
+            if not lost.is_set():
+                queue.fail(job.id, worker, str(e))
+        finally:
+            finished.set()
+            beat.join()
+        done += 1
+    return done
+
+
+def run_workers(concurrency: int = 1, **kwargs: Any) -> int:
+    """Run `concurrency` worker threads sharing one warm context; SIGINT/SIGTERM stop after current jobs."""
+    import signal
+    from .warm import WarmContext
+
+    queue = JobQueue(kwargs.pop("path", None))
+    stop = kwargs.pop("stop", None) or threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            signal.signal(sig, lambda *_: stop.set())
+        except (ValueError, OSError):  # pragma: no cover - not main thread / unsupported
+            pass
+    warm = WarmContext()
+    counts: List[int] = [0] * max(1, concurrency)
+
+    def _run(i: int) -> None:
+        counts[i] = run_worker(queue, worker=default_worker_id(i), stop=stop, warm=warm, **kwargs)
+
+    threads = [threading.Thread(target=_run, args=(i,), name=f"worker-{i}") for i in range(len(counts))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        while t.is_alive():
+            t.join(0.5)
+    return sum(counts)
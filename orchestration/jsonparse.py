@@ -0,0 +1,140 @@
+"""Bounded, single-pass JSON extraction from model text.
+
+Handles the shapes models actually return: bare JSON, JSON inside ``` fences,
+JSON surrounded by prose, and output truncated mid-object (closed up to the
+last complete element; such results are flagged partial and callers should
+not trust them as complete). No backtracking regexes: candidates are delimited by
+one linear bracket/string scan, and at most MAX_CANDIDATES are tried.
+Callers that know the shape they want pass ``accept`` (e.g. ``is_object``) so
+prose like "see [1]" ahead of the real object is skipped rather than returned.
+"""
+from __future__ import annotations
+from dataclasses import dataclass
+from typing import Any, Callable, List, Optional, Tuple
+import json
+
+MAX_CHARS = 256_000
+MAX_CANDIDATES = 8
+_CLOSERS = {"{": "}", "[": "]"}
+
+
+def is_object(value: Any) -> bool:
+    return isinstance(value, dict)
+
+
+@dataclass
+class Extracted:
+    value: Any
+    fenced: bool = False
+    partial: bool = False  # recovered by closing truncated output
+
+
+def _fenced_body(text: str) -> Optional[str]:
+    start = text.find("```")
+    if start < 0:
+        return None
+    body_start = text.find("\n", start)
+    if body_start < 0:
+        return None
+    end = text.find("```", body_start)
+    return text[body_start + 1:end if end >= 0 else len(text)]
+
+
+def _scan(text: str, start: int) -> Tuple[int, List[str], bool, List[Tuple[int, Tuple[str, ...]]]]:
+    """Scan from an opener; return (end, open stack, in_string, comma checkpoints).
+
+    end is the index after the matching closer, -1 if the text ran out
+    (truncated), or -2 on a mismatched closer.
+    """
+    stack: List[str] = []
+    in_str = False
+    esc = False
+    checkpoints: List[Tuple[int, Tuple[str, ...]]] = []
+    for i in range(start, len(text)):
+        c = text[i]
+        if in_str:
+            if esc:
+                esc = False
+            elif c == "\\":
+                esc = True
+            elif c == '"':
+                in_str = False
+            continue
+        if c == '"':
+            in_str = True
+        elif c in _CLOSERS:
+            stack.append(c)
+        elif c == "}" or c == "]":
+            if not stack or _CLOSERS[stack[-1]] != c:
+                return -2, stack, False, checkpoints
+            stack.pop()
+            if not stack:
+                return i + 1, stack, False, checkpoints
+        elif c == ",":
+            checkpoints.append((i, tuple(stack)))
+    return -1, stack, in_str, checkpoints
+
+
+def _close(fragment: str, stack: Tuple[str, ...] | List[str]) -> str:
+    return fragment + "".join(_CLOSERS[c] for c in reversed(stack))
+
+
+def _repair_truncated(text: str, start: int, stack: List[str], in_str: bool, checkpoints: List[Tuple[int, Tuple[str, ...]]]) -> Optional[Any]:
+    fragment = text[start:].rstrip()
+    # Drop the trailing incomplete element: cut back to the last comma
+    cuts = [_close(text[start:idx], st) for idx, st in reversed(checkpoints[-3:])]
+    closed = _close(fragment + ('"' if in_str else ""), stack)
+    # A dangling string is a cut-off value ("ba" of "bash"): never keep it if an earlier cut parses
+    attempts = cuts + [closed] if in_str else [closed] + cuts
+    for candidate in attempts:
+        try:
+            return json.loads(candidate)
+        except ValueError:
+            continue
+    return None
+
+
+def extract_json(text: str, max_chars: int = MAX_CHARS, accept: Optional[Callable[[Any], bool]] = None) -> Optional[Extracted]:
+    """Return the first JSON object/array found in text that satisfies accept (default: any), or None."""
+    ok = accept or (lambda value: True)
+    if not text:
+        return None
+    text = text[:max_chars]
+    fenced = False
+    body = _fenced_body(text)
+    if body is not None and ("{" in body or "[" in body):
+        text, fenced = body, True
+    stripped = text.strip()
+    if stripped[:1] in ("{", "["):
+        try:
+            value = json.loads(stripped)
+            if ok(value):
+                return Extracted(value, fenced=fenced)
+        except ValueError:
+            pass
+    pos = 0
+    for _ in range(MAX_CANDIDATES):
+        obj = text.find("{", pos)
+        arr = text.find("[", pos)
+        starts = [p for p in (obj, arr) if p >= 0]
+        if not starts:
+            return None
+        start = min(starts)
+        end, stack, in_str, checkpoints = _scan(text, start)
+        if end > 0:
+            try:
+                value = json.loads(text[start:end])
+            except ValueError:
+                pass
+            else:
+                if ok(value):
+                    return Extracted(value, fenced=fenced)
+                pos = end  # a complete value of the wrong shape: skip it whole, not its nested parts
+                continue
+        elif end == -1:
+            value = _repair_truncated(text, start, stack, in_str, checkpoints)
+            if value is not None and ok(value):
+                return Extracted(value, fenced=fenced, partial=True)
+            return None  # ran to the end of the text; later openers are nested inside this one
+        pos = start + 1
+    return None
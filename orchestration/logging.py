@@ -1,20 +1,36 @@
 from __future__ import annotations
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, List, Optional
 import os
 import json
+import threading
 import time
 import uuid
 
 EVENTS_FILE = "events.jsonl"
 
+# In-process subscribers (e.g. the serve daemon streaming events back to a caller)
+_listeners: List[Callable[[Dict[str, Any]], None]] = []
+_listeners_lock = threading.Lock()
+
 
 def _runtime_dir() -> str:
     root = os.path.dirname(os.path.dirname(__file__))
-    path = os.path.join(root, "runtime")
+    path = os.environ.get("WARP_RUNTIME_DIR") or os.path.join(root, "runtime")
     os.makedirs(path, exist_ok=True)
     return path
 
 
+def add_listener(fn: Callable[[Dict[str, Any]], None]) -> None:
+    with _listeners_lock:
+        _listeners.append(fn)
+
+
+def remove_listener(fn: Callable[[Dict[str, Any]], None]) -> None:
+    with _listeners_lock:
+        if fn in _listeners:
+            _listeners.remove(fn)
+
+
 def log_event(kind: str, data: Dict[str, Any], agent: Optional[str] = None, phase: Optional[str] = None, status: Optional[str] = None, error: Optional[str] = None) -> None:
     ev = {
         "ts": time.time(),
@@ -32,3 +48,8 @@ def log_event(kind: str, data: Dict[str, Any], agent: Optional[str] = None, phas
             f.write(json.dumps(ev, ensure_ascii=False) + "\n")
     except Exception:
         pass
+    for fn in list(_listeners):
+        try:
+            fn(ev)
+        except Exception:
+            pass
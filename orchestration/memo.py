@@ -0,0 +1,249 @@
+"""Node-level memoization for the orchestration runner.
+
+Each node's output (its partial state update) is cached under a fingerprint
+of the inputs it actually depends on:
+- plan_step:     goal + repo tree hash (HEAD tree + uncommitted changes,
+                 runtime/ excluded)
+- execute_step:  plan + approval policy version (+ simulate_* context flags)
+- validate_step: proposed action set + hashes of files under the action paths
+                 (+ which validators are installed)
+Every fingerprint also covers the backend the node's agent would call
+(provider/model per profile, keyless mock mode, fixture replay), so mock or
+fixture output is never replayed once real keys are configured. Outputs a
+step marks as degraded (provider failure -> deterministic fallback) are not
+stored. A replayed execute_step gets fresh action ids and re-emits its
+action_proposed events.
+
+Cache entries live in runtime/cache/nodes/<node>/<fingerprint>.json.
+Controls: constraints {"force": true | ["plan_step", ...]} skips lookups
+(outputs are still stored); invalidate() / `python -m orchestration cache
+invalidate [--node NAME]` drops entries.
+"""
+from __future__ import annotations
+from typing import Any, Callable, Dict, List, Optional
+from fnmatch import fnmatch
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import uuid
+
+from .config import policy_version
+from .logging import log_event
+
+# State keys never cached: per-run bookkeeping rather than node output
+_SKIP_KEYS = {"history"}
+# Statuses that depend on something outside the fingerprint (human approval, failure)
+_NO_STORE_STATUSES = {"awaiting_approval", "failed"}
+
+
+def _repo_root() -> str:
+    return os.path.dirname(os.path.dirname(__file__))
+
+
+def _cache_dir(node: Optional[str] = None) -> str:
+    runtime = os.environ.get("WARP_RUNTIME_DIR") or os.path.join(_repo_root(), "runtime")
+    path = os.path.join(runtime, "cache", "nodes")
+    return os.path.join(path, node) if node else path
+
+
+def _digest(*parts: Any) -> str:
+    h = hashlib.sha256()
+    for p in parts:
+        h.update(json.dumps(p, sort_keys=True, ensure_ascii=False, default=str).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()[:32]
+
+
+def _git(root: str, *args: str) -> str:
+    try:
+        return subprocess.check_output(["git", "--no-pager", *args], cwd=root, text=True, stderr=subprocess.DEVNULL)
+    except Exception:
+        return ""
+
+
+def _runtime_excludes(root: str) -> List[str]:
+    """Pathspecs for runtime state (dashboard JSON, events) that must not count as repo changes."""
+    specs = [":!runtime"]
+    runtime = os.environ.get("WARP_RUNTIME_DIR")
+    if runtime:
+        rel = os.path.relpath(os.path.abspath(runtime), os.path.abspath(root))
+        if rel != "." and not rel.startswith(".."):
+            specs.append(f":!{rel.replace(os.sep, '/')}")
+    return specs
+
+
+def repo_tree_hash(root: Optional[str] = None) -> str:
+    """HEAD tree id plus a digest of uncommitted changes to tracked files outside runtime/."""
+    root = root or _repo_root()
+    tree = _git(root, "rev-parse", "HEAD^{tree}").strip()
+    dirty = _git(root, "diff", "HEAD", "--no-ext-diff", "--binary", "--", ".", *_runtime_excludes(root))
+    return _digest(tree, hashlib.sha256(dirty.encode("utf-8", "replace")).hexdigest())
+
+
+def _file_hashes(root: str, globs: List[str]) -> Dict[str, str]:
+    """Blob ids of tracked files matching globs; working-tree content for modified ones."""
+    if not globs:
+        return {}
+    out: Dict[str, str] = {}
+    for line in _git(root, "ls-files", "-s").splitlines():
+        meta, _, path = line.partition("\t")
+        if path and any(fnmatch(path, g) for g in globs):
+            out[path] = meta.split()[1] if len(meta.split()) > 1 else ""
+    for path in _git(root, "diff", "--name-only", "HEAD").splitlines():
+        if path in out:
+            try:
+                with open(os.path.join(root, path), "rb") as f:
+                    out[path] = hashlib.sha256(f.read()).hexdigest()
+            except OSError:
+                out[path] = "missing"
+    return out
+
+
+def _action_globs(actions: Any) -> List[str]:
+    globs: List[str] = []
+    groups = actions.values() if isinstance(actions, dict) else [actions or []]
+    for group in groups:
+        for a in group or []:
+            if isinstance(a, dict):
+                globs.extend(a.get("paths") or [])
+    return sorted(set(globs))
+
+
+def _backend(state: Dict[str, Any], node: str) -> Dict[str, Any]:
+    """Router.describe() of the profile the node's agent calls."""
+    from .agents.concrete.executor import Executor
+    from .agents.concrete.planner import Planner
+    from .agents.concrete.validator import Validator
+    from .models.router import default_router
+
+    profile = {"plan_step": Planner.profile, "execute_step": Executor.profile, "validate_step": Validator.profile}[node]
+    warm = state.get("warm")
+    router = warm.router if warm is not None else default_router()
+    return router.describe(profile)
+
+
+def _fp_plan(state: Dict[str, Any]) -> str:
+    return _digest("plan_step", state.get("goal", ""), repo_tree_hash(), _backend(state, "plan_step"))
+
+
+def _fp_execute(state: Dict[str, Any]) -> str:
+    ctx = state.get("context") or {}
+    flags = {k: v for k, v in ctx.items() if k.startswith("simulate_")}
+    return _digest("execute_step", state.get("plan", []), policy_version(state.get("config") or {}), flags, _backend(state, "execute_step"))
+
+
+def without_ids(actions: Any) -> Any:
+    """Drop per-run action ids (fresh uuids) so identical action sets compare equal."""
+    if isinstance(actions, dict):
+        return {k: without_ids(v) for k, v in actions.items() if k != "id"}
+    if isinstance(actions, list):
+        return [without_ids(a) for a in actions]
+    return actions
+
+
+def _fp_validate(state: Dict[str, Any]) -> str:
+    actions = state.get("actions", {})
+    tools = {name: shutil.which(name) is not None for name in ("markdownlint-cli2", "yamllint", "shellcheck", "pwsh")}
+    return _digest("validate_step", without_ids(actions), _file_hashes(_repo_root(), _action_globs(actions)), tools, _backend(state, "validate_step"))
+
+
+FINGERPRINTS: Dict[str, Callable[[Dict[str, Any]], str]] = {
+    "plan_step": _fp_plan,
+    "execute_step": _fp_execute,
+    "validate_step": _fp_validate,
+}
+
+
+def fingerprint(node: str, state: Dict[str, Any]) -> Optional[str]:
+    fn = FINGERPRINTS.get(node)
+    if fn is None:
+        return None
+    try:
+        return fn(state)
+    except Exception:
+        return None
+
+
+def is_forced(node: str, state: Dict[str, Any]) -> bool:
+    force = (state.get("constraints") or {}).get("force")
+    if isinstance(force, (list, tuple, set)):
+        return node in force
+    return bool(force)
+
+
+def lookup(node: str, fp: str) -> Optional[Dict[str, Any]]:
+    path = os.path.join(_cache_dir(node), f"{fp}.json")
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return (json.load(f) or {}).get("updates")
+    except Exception:
+        return None
+
+
+def store(node: str, fp: str, updates: Dict[str, Any], context_before: Optional[Dict[str, Any]] = None) -> None:
+    """Persist a node's updates. Only the context keys the node added/changed are kept,
+    so a hit never replays another run's caller-supplied context."""
+    if (updates or {}).get("status") in _NO_STORE_STATUSES:
+        return
+    if (updates or {}).get("preapproved"):
+        return  # cleared by cached approvals, which can expire or be revoked
+    if node in ((updates or {}).get("degraded") or []):
+        return  # fallback output after a provider failure
+    kept = {k: v for k, v in (updates or {}).items() if k not in _SKIP_KEYS}
+    if isinstance(kept.get("context"), dict) and context_before is not None:
+        kept["context"] = {k: v for k, v in kept["context"].items() if k not in context_before or context_before[k] != v}
+    payload = {"node": node, "fingerprint": fp, "updates": kept}
+    try:
+        d = _cache_dir(node)
+        os.makedirs(d, exist_ok=True)
+        tmp = os.path.join(d, f".{fp}.{os.getpid()}.tmp")
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(payload, f, ensure_ascii=False, default=str)
+        os.replace(tmp, os.path.join(d, f"{fp}.json"))
+    except Exception:
+        pass
+
+
+def apply_cached(state: Dict[str, Any], node: str, fp: str, cached: Dict[str, Any]) -> Dict[str, Any]:
+    """Return state updates from a cache entry; cached context keys merge into the current context."""
+    updates: Dict[str, Any] = {}
+    for k, v in cached.items():
+        if k == "context" and isinstance(v, dict) and isinstance(state.get(k), dict):
+            updates[k] = {**state[k], **v}
+        else:
+            updates[k] = v
+    if node == "execute_step":
+        _replay_proposals(state, updates.get("actions"))
+    (state.setdefault("history", [])).append({"phase": node, "cache_hit": fp})
+    return updates
+
+
+def _replay_proposals(state: Dict[str, Any], actions: Any) -> None:
+    """Give replayed actions fresh ids and emit the action_proposed events the step would have."""
+    groups = actions.values() if isinstance(actions, dict) else [actions or []]
+    for group in groups:
+        for a in group or []:
+            if not isinstance(a, dict):
+                continue
+            if "id" in a:
+                a["id"] = str(uuid.uuid4())
+            log_event("action_proposed", {"runId": state.get("runId"), "actionId": a.get("id"), "cmd": a.get("cmd"), "approval": a.get("approval"), "paths": a.get("paths"), "replayed": True}, phase="execute")
+
+
+def invalidate(node: Optional[str] = None) -> int:
+    """Delete cached outputs (all nodes, or one); return number of entries removed."""
+    removed = 0
+    nodes = [node] if node else list(FINGERPRINTS)
+    for n in nodes:
+        d = _cache_dir(n)
+        if not os.path.isdir(d):
+            continue
+        for name in os.listdir(d):
+            try:
+                os.unlink(os.path.join(d, name))
+                removed += 1
+            except OSError:
+                pass
+    return removed
@@ -1,7 +1,16 @@
 from __future__ import annotations
-from dataclasses import dataclass
-from typing import Any, Dict, Optional
+from dataclasses import asdict, dataclass, field
+from typing import Any, Dict, List, Optional, Tuple
+import atexit
+import json
 import os
+import random
+import threading
+import time
+import weakref
+
+from ..logging import log_event
+from ..providers.base import cache_usage
 
 try:
     import yaml  # type: ignore
@@ -18,17 +27,127 @@ class ModelSpec:
     extra: Dict[str, Any] = None  # type: ignore
 
 
+@dataclass
+class RouteStats:
+    """Exponentially weighted performance of one concrete profile."""
+    n: int = 0
+    latency_ms: float = 0.0
+    tokens_per_s: float = 0.0
+    error_rate: float = 0.0
+    cost_per_token: float = 0.0
+    # Cumulative prompt tokens: uncached input vs prompt-cache reads/writes
+    input_tokens: int = 0
+    cache_read_tokens: int = 0
+    cache_write_tokens: int = 0
+    updated: float = field(default_factory=time.time)
+
+    def observe(self, alpha: float, latency_ms: float, tokens: int, error: bool, cost_per_token: Optional[float], usage: Optional[Dict[str, int]] = None) -> None:
+        a = 1.0 if self.n == 0 else alpha
+        self.latency_ms += a * (latency_ms - self.latency_ms)
+        self.error_rate += a * ((1.0 if error else 0.0) - self.error_rate)
+        if not error and tokens > 0:
+            self.tokens_per_s += a * (tokens / max(latency_ms / 1000.0, 1e-3) - self.tokens_per_s)
+        if cost_per_token is not None:
+            self.cost_per_token += a * (cost_per_token - self.cost_per_token)
+        if usage:
+            self.input_tokens += usage.get("input", 0)
+            self.cache_read_tokens += usage.get("cache_read", 0)
+            self.cache_write_tokens += usage.get("cache_write", 0)
+        self.n += 1
+        self.updated = time.time()
+
+
+def _usage_tokens(usage: Dict[str, Any]) -> Dict[str, int]:
+    """Normalize provider usage payloads (Anthropic/OpenAI/Gemini) to input/output/cache counts.
+
+    "input" is uncached input: Anthropic reports cache reads/writes apart from
+    input_tokens, OpenAI and Gemini include cached tokens in the prompt count.
+    """
+    usage = usage or {}
+    cache = cache_usage(usage)
+    if "input_tokens" in usage:
+        inp = int(usage.get("input_tokens") or 0)
+    else:
+        inp = max(0, int(usage.get("prompt_tokens", usage.get("promptTokenCount", 0)) or 0) - cache["read"])
+    out = usage.get("output_tokens", usage.get("completion_tokens", usage.get("candidatesTokenCount", 0))) or 0
+    return {"input": inp, "output": int(out), "cache_read": cache["read"], "cache_write": cache["write"]}
+
+
+class _ObservedClient:
+    """Client proxy timing generate calls and feeding outcomes back to the router."""
+
+    def __init__(self, client: Any, router: "ModelRouter", profile: str):
+        self._client = client
+        self._router = router
+        self._profile = profile
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    def _observed(self, fn: Any, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        try:
+            result = fn(*args, **kwargs)
+        except Exception:
+            self._router.observe(self._profile, (time.perf_counter() - t0) * 1000.0, {}, error=True)
+            raise
+        # Mock/fixture replies say nothing about the provider; a batched reply's wait is queueing, not latency
+        if not result.get("mock") and not result.get("replayed") and not result.get("batch"):
+            self._router.observe(self._profile, (time.perf_counter() - t0) * 1000.0, result.get("usage") or {}, error=False)
+        return result
+
+    def generate(self, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        return self._observed(self._client.generate, *args, **kwargs)
+
+    def generate_json(self, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        return self._observed(self._client.generate_json, *args, **kwargs)
+
+
 class ModelRouter:
     """Loads .warp/models/*.yml and resolves a profile name to a provider client.
 
     Expected keys per profile file (best-effort): provider, model, temperature, max_tokens.
     Unknown keys are stored in extra and passed to clients.
+
+    Adaptive pools: a profile declaring `candidates` (list of profile names) is
+    resolved per request to one of them, using EWMA stats (latency, tokens/s,
+    error rate, cost per token from usage x cost_per_1k_input/output, with
+    prompt-cache reads/writes priced by cost_per_1k_cache_read/_write, default
+    0.1x / 1.25x input) kept in runtime/router-stats.json. Pool keys:
+      objective: min_latency | min_cost | max_throughput   (default min_latency)
+      slo_latency_ms / max_error_rate: constraints for min_cost
+      explore: probability of a random candidate (default 0.1)
+    Every pool resolution is logged as a route_decision event.
+
+    Stats are shared by every process using the runtime dir (daemon, job
+    workers): observations are applied locally at once and queued, and at
+    most every FLUSH_S (or FLUSH_MAX observations, and at exit) the queue is
+    replayed onto the on-disk stats under a lock file, so concurrent
+    processes merge their samples instead of overwriting each other.
+
+    Callers without a warm router share default_router() rather than
+    constructing their own; one atexit hook flushes every live router.
     """
 
-    def __init__(self, root: Optional[str] = None):
+    ALPHA = 0.2
+    MIN_SAMPLES = 3
+    FLUSH_S = 2.0
+    FLUSH_MAX = 32
+    LOCK_STALE_S = 10.0
+
+    def __init__(self, root: Optional[str] = None, stats_path: Optional[str] = None):
         self.root = root or os.path.dirname(os.path.dirname(__file__))
         self._profiles: Dict[str, ModelSpec] = {}
         self._load_profiles()
+        runtime = os.environ.get("WARP_RUNTIME_DIR") or os.path.join(os.path.dirname(self.root), "runtime")
+        self.stats_path = stats_path or os.path.join(runtime, "router-stats.json")
+        self._stats: Dict[str, RouteStats] = {}
+        self._pending: List[Tuple[str, float, int, bool, Optional[float], Dict[str, int]]] = []
+        self._flushed = time.monotonic()
+        self._lock = threading.Lock()
+        self._rng = random.Random()
+        self._load_stats()
+        _live.add(self)  # weak: the exit flush must not keep routers alive
 
     def _load_profiles(self) -> None:
         models_dir = os.path.join(os.path.dirname(self.root), ".warp", "models")
@@ -52,17 +171,150 @@ class ModelRouter:
             )
             self._profiles[key] = spec
 
+    # -- stats ------------------------------------------------------------
+    def _read_stats(self) -> Dict[str, RouteStats]:
+        try:
+            with open(self.stats_path, "r", encoding="utf-8") as f:
+                raw = json.load(f) or {}
+            return {k: RouteStats(**v) for k, v in raw.items() if isinstance(v, dict)}
+        except Exception:
+            return {}
+
+    def _load_stats(self) -> None:
+        self._stats = self._read_stats()
+
+    def _acquire_file_lock(self, timeout: float = 5.0) -> Optional[str]:
+        """O_EXCL lock file next to the stats (portable, works on shared mounts); stale locks are broken."""
+        path = f"{self.stats_path}.lock"
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+                return path
+            except FileExistsError:
+                try:
+                    if time.time() - os.stat(path).st_mtime > self.LOCK_STALE_S:
+                        os.unlink(path)
+                        continue
+                except OSError:
+                    continue
+                if time.monotonic() >= deadline:
+                    return None
+                time.sleep(0.01)
+
+    def flush(self) -> None:
+        """Replay queued observations onto the on-disk stats (merging with other processes) and reload."""
+        with self._lock:
+            pending, self._pending = self._pending, []
+            self._flushed = time.monotonic()
+        if not pending:
+            return
+        try:
+            os.makedirs(os.path.dirname(self.stats_path), exist_ok=True)
+            lock = self._acquire_file_lock()
+            if lock is None:  # keep the samples for the next flush
+                with self._lock:
+                    self._pending[:0] = pending
+                return
+            try:
+                merged = self._read_stats()
+                for profile, latency_ms, tokens_out, error, cost_per_token, usage in pending:
+                    merged.setdefault(profile, RouteStats()).observe(self.ALPHA, latency_ms, tokens_out, error, cost_per_token, usage)
+                tmp = f"{self.stats_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+                with open(tmp, "w", encoding="utf-8") as f:
+                    json.dump({k: asdict(v) for k, v in merged.items()}, f, indent=2)
+                os.replace(tmp, self.stats_path)
+            finally:
+                os.unlink(lock)
+            with self._lock:
+                # Merged view, plus anything observed locally while flushing
+                for profile, latency_ms, tokens_out, error, cost_per_token, usage in self._pending:
+                    merged.setdefault(profile, RouteStats()).observe(self.ALPHA, latency_ms, tokens_out, error, cost_per_token, usage)
+                self._stats = merged
+        except Exception:
+            pass
+
+    def stats(self, profile: str) -> RouteStats:
+        return self._stats.get(profile) or RouteStats()
+
+    def observe(self, profile: str, latency_ms: float, usage: Dict[str, Any], error: bool = False) -> None:
+        spec = self._profiles.get(profile)
+        extra = (spec.extra if spec else None) or {}
+        tokens = _usage_tokens(usage)
+        total = tokens["input"] + tokens["cache_read"] + tokens["cache_write"] + tokens["output"]
+        cost_per_token = None
+        if total > 0 and ("cost_per_1k_input" in extra or "cost_per_1k_output" in extra):
+            per_in = float(extra.get("cost_per_1k_input", 0))
+            cost = (
+                tokens["input"] * per_in
+                + tokens["cache_read"] * float(extra.get("cost_per_1k_cache_read", 0.1 * per_in))
+                + tokens["cache_write"] * float(extra.get("cost_per_1k_cache_write", 1.25 * per_in))
+                + tokens["output"] * float(extra.get("cost_per_1k_output", 0))
+            )
+            cost_per_token = cost / 1000.0 / total
+        with self._lock:
+            st = self._stats.setdefault(profile, RouteStats())
+            st.observe(self.ALPHA, latency_ms, tokens["output"], error, cost_per_token, tokens)
+            self._pending.append((profile, latency_ms, tokens["output"], error, cost_per_token, tokens))
+            due = len(self._pending) >= self.FLUSH_MAX or time.monotonic() - self._flushed >= self.FLUSH_S
+        if due:
+            self.flush()
+
+    # -- routing ----------------------------------------------------------
+    def _candidates(self, profile: str) -> List[str]:
+        spec = self._profiles.get(profile)
+        cands = ((spec.extra if spec else None) or {}).get("candidates") or []
+        return [str(c) for c in cands if str(c) in self._profiles]
+
+    def select(self, profile: str) -> str:
+        """Return the concrete profile to use for this request (the profile itself unless it is a pool)."""
+        cands = self._candidates(profile)
+        if not cands:
+            return profile
+        extra = self._profiles[profile].extra or {}
+        objective = str(extra.get("objective", "min_latency"))
+        explore = float(extra.get("explore", 0.1))
+        slo = float(extra.get("slo_latency_ms", 0) or 0)
+        max_err = float(extra.get("max_error_rate", 0.2))
+        stats = {c: self.stats(c) for c in cands}
+        cold = [c for c in cands if stats[c].n < self.MIN_SAMPLES]
+        reason = objective
+        if cold:
+            chosen, reason = self._rng.choice(cold), "warmup"
+        elif self._rng.random() < explore:
+            chosen, reason = self._rng.choice(cands), "explore"
+        else:
+            def latency_score(c: str) -> float:
+                # Errors cost a retry: penalize latency by the error rate
+                return stats[c].latency_ms * (1.0 + 4.0 * stats[c].error_rate)
+
+            if objective == "min_cost":
+                ok = [c for c in cands if stats[c].error_rate <= max_err and (not slo or stats[c].latency_ms <= slo)]
+                chosen = min(ok, key=lambda c: stats[c].cost_per_token) if ok else min(cands, key=latency_score)
+                if not ok:
+                    reason = "min_cost:slo_unmet"
+            elif objective == "max_throughput":
+                chosen = max(cands, key=lambda c: stats[c].tokens_per_s * (1.0 - stats[c].error_rate))
+            else:
+                chosen = min(cands, key=latency_score)
+        log_event("route_decision", {
+            "pool": profile,
+            "chosen": chosen,
+            "objective": objective,
+            "reason": reason,
+            "stats": {c: {"n": s.n, "latency_ms": round(s.latency_ms, 1), "tokens_per_s": round(s.tokens_per_s, 1), "error_rate": round(s.error_rate, 3), "cost_per_token": s.cost_per_token} for c, s in stats.items()},
+        }, phase="route")
+        return chosen
+
     def resolve(self, profile: str) -> Optional[ModelSpec]:
         return self._profiles.get(profile)
 
-    def get_client(self, profile: str):
+    @staticmethod
+    def _provider_client(spec: ModelSpec):
         from ..providers.anthropic_client import AnthropicClient
         from ..providers.openai_client import OpenAIClient
         from ..providers.gemini_client import GeminiClient
 
-        spec = self.resolve(profile)
-        if not spec:
-            return None
         if spec.provider.lower() in ("anthropic", "claude"):
             return AnthropicClient(spec)
         if spec.provider.lower() in ("openai", "oai"):
@@ -71,3 +323,52 @@ class ModelRouter:
             return GeminiClient(spec)
         # default fallback
         return AnthropicClient(spec)
+
+    def describe(self, profile: str) -> Dict[str, Any]:
+        """What a call to profile can reach, without routing: provider/model of each concrete
+        profile (every candidate of a pool), whether it is keyless (mock replies) and any
+        fixture replay. Memo fingerprints include it, so outputs never cross backends."""
+        out: Dict[str, Any] = {}
+        for name in self._candidates(profile) or [profile]:
+            spec = self.resolve(name)
+            if spec is None:
+                out[name] = None
+                continue
+            out[name] = {"provider": spec.provider, "model": spec.model, "mock": not self._provider_client(spec).api_key()}
+        if os.environ.get("WARP_PROVIDER_FIXTURES"):
+            out["fixtures"] = [os.environ["WARP_PROVIDER_FIXTURES"], os.environ.get("WARP_PROVIDER_MODE", "replay")]
+        return out
+
+    def get_client(self, profile: str, cancel: Optional[Any] = None):
+        """Client for profile (pools resolved per call). cancel, the run's CancelToken, bounds
+        batched calls (providers/batching.py) when batching is on for the profile."""
+        from ..providers import batching, fixtures
+
+        chosen = self.select(profile)
+        spec = self.resolve(chosen)
+        if not spec:
+            return None
+        client = batching.wrap(self._provider_client(spec), chosen, spec.extra, cancel)
+        return _ObservedClient(fixtures.wrap(client, chosen), self, chosen)
+
+
+_live: "weakref.WeakSet[ModelRouter]" = weakref.WeakSet()
+_defaults: Dict[str, ModelRouter] = {}
+_defaults_lock = threading.Lock()
+
+
+@atexit.register
+def _flush_all() -> None:
+    for router in list(_live):
+        router.flush()
+
+
+def default_router() -> ModelRouter:
+    """The process-wide router for callers without a warm one (one per runtime dir,
+    since stats live under WARP_RUNTIME_DIR)."""
+    key = os.environ.get("WARP_RUNTIME_DIR") or ""
+    with _defaults_lock:
+        router = _defaults.get(key)
+        if router is None:
+            router = _defaults[key] = ModelRouter()
+        return router
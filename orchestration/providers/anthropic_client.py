@@ -1,33 +1,154 @@
 from __future__ import annotations
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Callable, List, Optional, Sequence, Tuple
+import json
 import os
-import requests  # type: ignore
-from .base import BaseClient
+import time
+from .base import DEFAULT_TIMEOUT_S, BaseClient, PromptLike, Segment, cache_usage, http_session
+
+MAX_CACHE_BREAKPOINTS = 4  # Messages API limit per request
+MIN_CACHE_TOKENS = 1024  # shortest prefix the API caches (Sonnet/Opus; Haiku: 2048); profile `min_cache_tokens`
+
+# One batched call: (system, prompt, schema); schema None means generate(), else generate_json()
+BatchCall = Tuple[PromptLike, PromptLike, Optional[Dict[str, Any]]]
+
+
+class BatchRequestError(RuntimeError):
+    """A request inside a Message Batch that did not succeed (errored, canceled or expired)."""
+
+    def __init__(self, kind: str, detail: str = ""):
+        super().__init__(f"batch request {kind}" + (f": {detail}" if detail else ""))
+        self.kind = kind
+
 
 class AnthropicClient(BaseClient):
     def api_key(self) -> Optional[str]:
         return os.environ.get("ANTHROPIC_API_KEY")
 
-    def generate(self, system: str, prompt: str) -> Dict[str, Any]:
-        key = self.api_key()
-        if not key:
-            return super().generate(system, prompt)
-        url = "https://api.anthropic.com/v1/messages"
-        headers = {
+    def _headers(self, key: str) -> Dict[str, str]:
+        return {
             "x-api-key": key,
             "anthropic-version": "2023-06-01",
             "content-type": "application/json",
         }
-        body = {
+
+    def _post(self, key: str, body: Dict[str, Any], timeout: Optional[float] = None, path: str = "/v1/messages") -> Dict[str, Any]:
+        url = f"{self.base_url('ANTHROPIC_BASE_URL', 'https://api.anthropic.com')}{path}"
+        resp = http_session().post(url, headers=self._headers(key), json=body, timeout=timeout or DEFAULT_TIMEOUT_S)
+        resp.raise_for_status()
+        return resp.json()
+
+    def _get(self, key: str, url: str) -> Any:
+        if not url.startswith(("http://", "https://")):
+            url = f"{self.base_url('ANTHROPIC_BASE_URL', 'https://api.anthropic.com')}{url}"
+        resp = http_session().get(url, headers=self._headers(key), timeout=DEFAULT_TIMEOUT_S)
+        resp.raise_for_status()
+        return resp
+
+    @staticmethod
+    def _blocks(segments: List[Segment], marks: Dict[str, int]) -> List[Dict[str, Any]]:
+        """Text blocks with cache_control on the last block of each cacheable run.
+
+        Empty segments are skipped: the API rejects empty text blocks. A
+        breakpoint is only set while the budget lasts and once the prefix up
+        to it (tools, system, earlier blocks; ~4 chars per token, tracked in
+        marks["chars"]) reaches marks["min_tokens"]: a shorter prefix is
+        never cached, and the breakpoint is better spent on a later, longer run.
+        """
+        blocks: List[Dict[str, Any]] = []
+        segments = [seg for seg in segments if seg.text]
+        for i, seg in enumerate(segments):
+            block: Dict[str, Any] = {"type": "text", "text": seg.text}
+            marks["chars"] += len(seg.text)
+            run_ends = seg.cache and (i + 1 == len(segments) or not segments[i + 1].cache)
+            if run_ends and marks["left"] > 0 and marks["chars"] // 4 >= marks["min_tokens"]:
+                block["cache_control"] = {"type": "ephemeral"}
+                marks["left"] -= 1
+            blocks.append(block)
+        return blocks
+
+    def _body(self, system: PromptLike, prompt: PromptLike, tools: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+        sys_segs, user_segs = self.build_messages(system, prompt)
+        extra = getattr(self.spec, "extra", None) or {}
+        # Tools precede the system prompt in the cached prefix
+        marks = {"left": MAX_CACHE_BREAKPOINTS, "chars": len(json.dumps(tools)) if tools else 0, "min_tokens": int(extra.get("min_cache_tokens", MIN_CACHE_TOKENS))}
+        body: Dict[str, Any] = {
             "model": self.spec.model,
             "max_tokens": self.spec.max_tokens,
             "temperature": self.spec.temperature,
-            "system": system,
-            "messages": [{"role": "user", "content": prompt}],
+            "system": self._blocks(sys_segs, marks),
+            "messages": [{"role": "user", "content": self._blocks(user_segs, marks) or [{"type": "text", "text": "(no input)"}]}],
         }
-        resp = requests.post(url, headers=headers, json=body, timeout=60)
-        resp.raise_for_status()
-        data = resp.json()
-        text = "".join(p.get("text", "") for p in data.get("content", []))
+        if tools:
+            body["tools"] = tools
+        return body
+
+    def _json_body(self, system: PromptLike, prompt: PromptLike, schema: Dict[str, Any]) -> Dict[str, Any]:
+        # Forced tool use: the tool input is the structured result
+        body = self._body(system, prompt, tools=[{"name": "emit_result", "description": "Return the result as structured JSON.", "input_schema": schema}])
+        body["tool_choice"] = {"type": "tool", "name": "emit_result"}
+        return body
+
+    def _result(self, data: Dict[str, Any], schema: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """A Messages API reply as generate() (schema None) or generate_json() returns it."""
+        blocks = data.get("content", [])
+        text = "".join(p.get("text", "") for p in blocks)
         usage = data.get("usage", {})
-        return {"text": text, "usage": usage, "provider": "anthropic", "model": self.spec.model}
+        result = {"text": text, "usage": usage, "cache": cache_usage(usage), "provider": "anthropic", "model": self.spec.model}
+        if schema is None:
+            return result
+        tool_input = next((p.get("input") for p in blocks if p.get("type") == "tool_use"), None)
+        return self._with_parsed(result, mode="native", data=tool_input, schema=schema)
+
+    def generate(self, system: PromptLike, prompt: PromptLike, timeout: Optional[float] = None) -> Dict[str, Any]:
+        key = self.api_key()
+        if not key:
+            return super().generate(system, prompt, timeout=timeout)
+        return self._result(self._post(key, self._body(system, prompt), timeout))
+
+    def generate_json(self, system: PromptLike, prompt: PromptLike, schema: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        key = self.api_key()
+        if not key:
+            return super().generate_json(system, prompt, schema, timeout=timeout)
+        return self._result(self._post(key, self._json_body(system, prompt, schema), timeout), schema)
+
+    def generate_batch(self, calls: Sequence[BatchCall], max_wait_s: float = 3600.0, poll_s: float = 10.0, abort: Optional[Callable[[], bool]] = None) -> List[Any]:
+        """Run calls through the Message Batches API; one result dict or exception per call, in order.
+
+        The batch is created, polled every poll_s until it has ended and its
+        JSONL results fetched. If it has not ended within max_wait_s, or
+        abort() turns true (every caller gave up), the batch is cancelled and
+        TimeoutError raised. Batched requests are billed at the batch discount
+        and still read/write the prompt cache.
+        """
+        key = self.api_key()
+        if not key:
+            raise RuntimeError("Message Batches need ANTHROPIC_API_KEY")
+        requests = []
+        for i, (system, prompt, schema) in enumerate(calls):
+            body = self._body(system, prompt) if schema is None else self._json_body(system, prompt, schema)
+            requests.append({"custom_id": f"req-{i}", "params": body})
+        batch = self._post(key, {"requests": requests}, path="/v1/messages/batches")
+        deadline = time.monotonic() + max_wait_s
+        while batch.get("processing_status") != "ended":
+            if time.monotonic() >= deadline or (abort is not None and abort()):
+                try:
+                    self._post(key, {}, path=f"/v1/messages/batches/{batch['id']}/cancel")
+                except Exception:
+                    pass
+                raise TimeoutError(f"message batch {batch.get('id')} did not end within {max_wait_s:.0f}s")
+            time.sleep(max(0.0, min(poll_s, deadline - time.monotonic())))
+            batch = self._get(key, f"/v1/messages/batches/{batch['id']}").json()
+        results: Dict[str, Dict[str, Any]] = {}
+        for line in self._get(key, batch.get("results_url") or f"/v1/messages/batches/{batch['id']}/results").text.splitlines():
+            if line.strip():
+                item = json.loads(line)
+                results[str(item.get("custom_id"))] = item.get("result") or {}
+        out: List[Any] = []
+        for i, (_, _, schema) in enumerate(calls):
+            res = results.get(f"req-{i}") or {"type": "missing"}
+            if res.get("type") == "succeeded":
+                out.append({**self._result(res.get("message") or {}, schema), "batch": batch.get("id")})
+            else:
+                err = ((res.get("error") or {}).get("error") or {}).get("message", "")
+                out.append(BatchRequestError(str(res.get("type")), err))
+        return out
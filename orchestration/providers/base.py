@@ -1,8 +1,80 @@
 from __future__ import annotations
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Sequence, Tuple, Union
 from dataclasses import dataclass
+import hashlib
 import os
 import json
+import threading
+import time
+
+from ..jsonparse import extract_json, is_object
+
+DEFAULT_TIMEOUT_S = 60.0
+_SESSION = None
+_SESSION_LOCK = threading.Lock()
+
+
+def http_session():
+    """Process-wide pooled HTTP session shared by all provider clients.
+
+    Keeping one session alive lets long-lived processes (orchestration serve)
+    reuse TLS connections across runs instead of reconnecting per call.
+    """
+    global _SESSION
+    if _SESSION is None:
+        with _SESSION_LOCK:
+            if _SESSION is None:
+                import requests  # type: ignore
+
+                session = requests.Session()
+                adapter = requests.adapters.HTTPAdapter(pool_connections=8, pool_maxsize=int(os.environ.get("WARP_HTTP_POOL_SIZE", "32")))
+                session.mount("https://", adapter)
+                session.mount("http://", adapter)
+                _SESSION = session
+    return _SESSION
+
+
+@dataclass(frozen=True)
+class Segment:
+    """A piece of a prompt; `cache` marks text that is identical across calls (a cacheable prefix)."""
+    text: str
+    cache: bool = False
+
+
+# Prompts are plain strings (variable) or ordered segments: stable cacheable parts first, variable suffix last
+PromptLike = Union[str, Sequence[Segment]]
+
+
+def as_segments(value: PromptLike, cache: bool = False) -> List[Segment]:
+    if isinstance(value, str):
+        return [Segment(value, cache)] if value else []
+    return [seg for seg in value if seg.text]
+
+
+def prompt_text(value: PromptLike) -> str:
+    return value if isinstance(value, str) else "".join(seg.text for seg in value)
+
+
+def cache_key(system: PromptLike, prompt: PromptLike) -> Optional[str]:
+    """Digest of the cacheable prefix (system + leading cacheable segments), None if nothing is cacheable."""
+    stable = [seg.text for seg in as_segments(system, cache=True) if seg.cache]
+    for seg in as_segments(prompt):
+        if not seg.cache:
+            break
+        stable.append(seg.text)
+    return hashlib.sha256("\0".join(stable).encode("utf-8")).hexdigest()[:32] if stable else None
+
+
+def cache_usage(usage: Dict[str, Any]) -> Dict[str, int]:
+    """Prompt-cache token counts from any provider's usage payload: {"read", "write"}."""
+    usage = usage or {}
+    read = usage.get("cache_read_input_tokens")  # Anthropic
+    if read is None:
+        read = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")  # OpenAI
+    if read is None:
+        read = usage.get("cachedContentTokenCount")  # Gemini
+    return {"read": int(read or 0), "write": int(usage.get("cache_creation_input_tokens") or 0)}
+
 
 @dataclass
 class BaseClient:
@@ -14,13 +86,63 @@ class BaseClient:
     def headers(self) -> Dict[str, str]:
         return {}
 
-    def generate(self, system: str, prompt: str) -> Dict[str, Any]:
-        """Return dict with text and usage. Subclasses should override.
+    def base_url(self, env_var: str, default: str) -> str:
+        """API root: profile `base_url`, then the provider's env var (proxies, local stubs), then the default."""
+        extra = getattr(self.spec, "extra", None) or {}
+        return str(extra.get("base_url") or os.environ.get(env_var) or default).rstrip("/")
+
+    def build_messages(self, system: PromptLike, prompt: PromptLike) -> Tuple[List[Segment], List[Segment]]:
+        """Split a call into (system segments, user segments).
+
+        System text is constant per agent, so it is cacheable; user segments
+        keep their own marks. Providers with explicit cache markers turn the
+        last segment of each cacheable run into a breakpoint; the others rely
+        on the stable prefix coming first (automatic prefix caching).
+        """
+        return as_segments(system, cache=True), as_segments(prompt)
+
+    def generate(self, system: PromptLike, prompt: PromptLike, timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Return dict with text, usage and cache ({"read", "write"} tokens). Subclasses should override.
         Fallback returns mock output when no API key is present.
+        system is treated as a stable (cacheable) prefix; prompt may be a list
+        of Segments so providers can mark its stable parts cacheable too.
+        timeout (seconds) bounds the HTTP call; None means DEFAULT_TIMEOUT_S.
         """
         return {
-            "text": f"[MOCK:{self.__class__.__name__}] {prompt[:120]}...",
+            "text": f"[MOCK:{self.__class__.__name__}] {prompt_text(prompt)[:120]}...",
             "usage": {"input_tokens": 0, "output_tokens": 0},
+            "cache": {"read": 0, "write": 0},
             "provider": self.__class__.__name__,
             "model": getattr(self.spec, 'model', 'unknown'),
+            "mock": True,
         }
+
+    def generate_json(self, system: PromptLike, prompt: PromptLike, schema: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        """Like generate(), plus "data" (parsed JSON or None) and "mode".
+
+        Subclasses override to use the provider's native structured output
+        (mode "native"); this fallback extracts JSON from the text (mode "text").
+        """
+        result = self.generate(system, prompt, timeout=timeout)
+        return self._with_parsed(result, mode="text", schema=schema)
+
+    @staticmethod
+    def _with_parsed(result: Dict[str, Any], mode: str, data: Any = None, json_text: Optional[str] = None, schema: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """Attach "data"/"mode"/"partial"/"parse_ms": native data or json_text first, text extraction last.
+
+        Text extraction only accepts a value of the schema's top-level type, so
+        a stray "[1]" in prose is not mistaken for the requested object.
+        """
+        t0 = time.perf_counter()
+        if data is None and json_text is not None:
+            try:
+                data = json.loads(json_text)
+            except ValueError:
+                data = None
+        partial = False
+        if data is None:
+            kind = (schema or {}).get("type")
+            accept = is_object if kind == "object" else (lambda v: isinstance(v, list)) if kind == "array" else None
+            found = extract_json(result.get("text", ""), accept=accept)
+            data, mode, partial = (found.value if found else None), "text", bool(found and found.partial)
+        return {**result, "data": data, "mode": mode, "partial": partial, "parse_ms": (time.perf_counter() - t0) * 1000.0}
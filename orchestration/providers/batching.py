@@ -0,0 +1,216 @@
+"""Opt-in Message Batches for provider calls that can wait (queue jobs).
+
+Calls for a profile are collected for up to `window_ms` or `max_batch`
+requests, whichever comes first, and sent as one asynchronous provider batch
+(Anthropic Message Batches: billed at half the synchronous price, results
+typically within minutes, at most 24h). Each caller blocks until its own
+result (or exception) is back, the run is cancelled, or `max_wait_s` runs out;
+the batch is polled every `poll_s`. Only clients exposing
+`generate_batch(calls, max_wait_s, poll_s, abort)` are wrapped, so other
+providers and keyless (mock) clients keep calling directly.
+
+This trades latency for cost, so it suits job workers, not interactive runs:
+`python -m orchestration worker --batch` turns it on for the worker process,
+or per profile in .warp/models/<profile>.yml:
+
+    batch: {window_ms: 2000, max_batch: 64, max_wait_s: 3600, poll_s: 10}   # or `batch: true`
+
+(environment: WARP_BATCH=1, WARP_BATCH_WINDOW_MS, WARP_BATCH_MAX,
+WARP_BATCH_MAX_WAIT_S, WARP_BATCH_POLL_S). A batched call waits for the run's
+deadline, not the synchronous per-call timeout, and its wait is not fed into
+the router's latency stats.
+"""
+from __future__ import annotations
+from concurrent.futures import Future, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Tuple
+import os
+import queue
+import threading
+import time
+
+from ..cancel import CancelToken
+from ..logging import log_event
+
+MAX_INFLIGHT_BATCHES = 4  # batches polled concurrently per profile
+
+
+@dataclass(frozen=True)
+class BatchConfig:
+    window_ms: float = 2000.0
+    max_batch: int = 64
+    max_wait_s: float = 3600.0
+    poll_s: float = 10.0
+
+    @classmethod
+    def from_profile(cls, extra: Optional[Dict[str, Any]]) -> Optional["BatchConfig"]:
+        """Config for a profile, or None when batching is off for it."""
+        opt = (extra or {}).get("batch")
+        if not opt and os.environ.get("WARP_BATCH", "") not in ("1", "true", "yes"):
+            return None
+        opt = opt if isinstance(opt, dict) else {}
+        return cls(
+            window_ms=max(0.0, float(opt.get("window_ms", os.environ.get("WARP_BATCH_WINDOW_MS", cls.window_ms)))),
+            max_batch=max(1, int(opt.get("max_batch", os.environ.get("WARP_BATCH_MAX", cls.max_batch)))),
+            max_wait_s=max(1.0, float(opt.get("max_wait_s", os.environ.get("WARP_BATCH_MAX_WAIT_S", cls.max_wait_s)))),
+            poll_s=max(0.05, float(opt.get("poll_s", os.environ.get("WARP_BATCH_POLL_S", cls.poll_s)))),
+        )
+
+
+@dataclass
+class _Request:
+    client: Any
+    call: Tuple[Any, Any, Optional[Dict[str, Any]]]  # (system, prompt, schema or None)
+    future: Future
+    enqueued: float
+    abandoned: bool = False  # the caller stopped waiting (cancelled, deadline, max_wait_s)
+
+
+_STOP = object()
+
+
+class Batcher:
+    """Collects requests for one profile and sends them as provider batches."""
+
+    def __init__(self, profile: str, config: BatchConfig):
+        self.profile = profile
+        self.config = config
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._pool = ThreadPoolExecutor(max_workers=MAX_INFLIGHT_BATCHES, thread_name_prefix=f"batch-{profile}")
+        self._thread = threading.Thread(target=self._collect, name=f"batcher-{profile}", daemon=True)
+        self._thread.start()
+        self.batches = 0
+        self.requests = 0
+
+    def submit(self, client: Any, call: Tuple[Any, Any, Optional[Dict[str, Any]]]) -> _Request:
+        req = _Request(client, call, Future(), time.perf_counter())
+        self._queue.put(req)
+        return req
+
+    def close(self) -> None:
+        """Dispatch what is queued, then stop the collector and pool threads; batches in flight still finish."""
+        self._queue.put(_STOP)
+
+    def _collect(self) -> None:
+        try:
+            self._collect_until_stopped()
+        finally:
+            self._pool.shutdown(wait=False)
+
+    def _collect_until_stopped(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is _STOP:
+                return
+            batch: List[_Request] = [first]
+            stopping = False
+            window_end = first.enqueued + self.config.window_ms / 1000.0
+            while len(batch) < self.config.max_batch:
+                left = window_end - time.perf_counter()
+                if left <= 0:
+                    break
+                try:
+                    nxt = self._queue.get(timeout=left)
+                except queue.Empty:
+                    break
+                if nxt is _STOP:
+                    stopping = True
+                    break
+                batch.append(nxt)
+            self._dispatch(batch)
+            if stopping:
+                return
+
+    def _dispatch(self, batch: List[_Request]) -> None:
+        batch = [r for r in batch if not r.abandoned and r.future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        self.batches += 1
+        self.requests += len(batch)
+        log_event("batch_dispatched", {"profile": self.profile, "size": len(batch), "wait_ms": round((time.perf_counter() - batch[0].enqueued) * 1000.0, 2)}, phase="provider")
+        self._pool.submit(self._run, batch)
+
+    def _run(self, batch: List[_Request]) -> None:
+        t0 = time.perf_counter()
+        try:
+            results = batch[0].client.generate_batch(
+                [r.call for r in batch], max_wait_s=self.config.max_wait_s, poll_s=self.config.poll_s,
+                abort=lambda: all(r.abandoned for r in batch),
+            )
+        except BaseException as e:
+            log_event("batch_failed", {"profile": self.profile, "size": len(batch)}, status="error", phase="provider", error=str(e))
+            for r in batch:
+                r.future.set_exception(e)
+            return
+        errors = 0
+        for r, res in zip(batch, results):
+            if isinstance(res, BaseException):
+                errors += 1
+                r.future.set_exception(res)
+            else:
+                r.future.set_result(res)
+        log_event("batch_completed", {"profile": self.profile, "size": len(batch), "errors": errors, "batch_ms": round((time.perf_counter() - t0) * 1000.0, 1)}, phase="provider")
+
+
+_batchers: Dict[str, Batcher] = {}
+_batchers_lock = threading.Lock()
+
+
+def batcher_for(profile: str, config: BatchConfig) -> Batcher:
+    """The profile's Batcher; a changed config replaces it and closes the old one."""
+    with _batchers_lock:
+        b = _batchers.get(profile)
+        if b is None or b.config != config:
+            if b is not None:
+                b.close()
+            b = _batchers[profile] = Batcher(profile, config)
+        return b
+
+
+class BatchingClient:
+    """Client proxy sending generate/generate_json through the profile's Batcher."""
+
+    def __init__(self, client: Any, batcher: Batcher, cancel: Optional[CancelToken] = None):
+        self._client = client
+        self._batcher = batcher
+        self._cancel = cancel
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    def _wait(self, call: Tuple[Any, Any, Optional[Dict[str, Any]]]) -> Dict[str, Any]:
+        config = self._batcher.config
+        req = self._batcher.submit(self._client, call)
+        limit = time.monotonic() + config.window_ms / 1000.0 + config.max_wait_s
+        try:
+            while True:
+                if self._cancel is not None:
+                    self._cancel.check()  # raises Cancelled at the run's deadline or on cancel
+                left = limit - time.monotonic()
+                if left <= 0:
+                    raise TimeoutError(f"batched call for {self._batcher.profile} not answered within {config.max_wait_s:.0f}s")
+                try:
+                    return req.future.result(timeout=min(left, config.poll_s))
+                except FutureTimeout:
+                    continue
+        except BaseException:
+            req.abandoned = True
+            raise
+
+    # timeout is the synchronous per-call budget; a batched call is bounded by the run (cancel) and max_wait_s instead
+    def generate(self, system: Any, prompt: Any, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self._wait((system, prompt, None))
+
+    def generate_json(self, system: Any, prompt: Any, schema: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self._wait((system, prompt, schema))
+
+
+def wrap(client: Any, profile: str, extra: Optional[Dict[str, Any]], cancel: Optional[CancelToken] = None) -> Any:
+    """Wrap client in a BatchingClient when batching is on for the profile and the client can batch."""
+    if client is None or not hasattr(client, "generate_batch") or not client.api_key():
+        return client
+    config = BatchConfig.from_profile(extra)
+    if config is None:
+        return client
+    return BatchingClient(client, batcher_for(profile, config), cancel)
@@ -0,0 +1,128 @@
+"""Recorded provider fixtures for deterministic replay (e2e scenarios).
+
+Enabled by environment, so any code path that resolves clients through
+ModelRouter picks it up:
+- WARP_PROVIDER_FIXTURES=<file.json>  fixture file
+- WARP_PROVIDER_MODE=replay|record    (default replay)
+
+record calls the real client and appends each interaction; replay never
+touches the network. A request is matched by its key (method, model,
+system, prompt, schema); when prompts drifted, the next unused interaction
+of the same method and profile is used instead ("sequence" match). A miss
+returns the keyless mock reply and logs fixture_miss. A generate_json
+response without "data" (hand-written: raw model text only) is parsed on
+replay the way a text-mode provider reply is.
+"""
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Set
+import hashlib
+import json
+import os
+import threading
+
+from ..logging import log_event
+from .base import BaseClient, PromptLike, prompt_text
+
+_lock = threading.Lock()
+_loaded: Dict[str, List[Dict[str, Any]]] = {}
+_used: Dict[str, Set[int]] = {}
+
+
+def fixture_key(method: str, model: str, system: PromptLike, prompt: PromptLike, schema: Optional[Dict[str, Any]] = None) -> str:
+    # Keyed on the flattened text, so re-segmenting a prompt for caching keeps recorded fixtures valid
+    raw = json.dumps([method, model, prompt_text(system), prompt_text(prompt), schema], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32]
+
+
+def reset(path: Optional[str] = None) -> None:
+    """Forget loaded fixtures and replay cursors (per scenario)."""
+    with _lock:
+        if path is None:
+            _loaded.clear()
+            _used.clear()
+        else:
+            _loaded.pop(path, None)
+            _used.pop(path, None)
+
+
+def _interactions(path: str) -> List[Dict[str, Any]]:
+    if path not in _loaded:
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                _loaded[path] = list((json.load(f) or {}).get("interactions") or [])
+        except (OSError, ValueError):
+            _loaded[path] = []
+    return _loaded[path]
+
+
+def _save(path: str) -> None:
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    tmp = f"{path}.{os.getpid()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": 1, "interactions": _loaded.get(path, [])}, f, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+class FixtureClient:
+    """Wraps a provider client, replaying or recording its generate calls."""
+
+    def __init__(self, client: Any, profile: str, path: str, mode: str = "replay"):
+        self._client = client
+        self._profile = profile
+        self._path = path
+        self._mode = mode
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._client, name)
+
+    def _call(self, method: str, system: PromptLike, prompt: PromptLike, schema: Optional[Dict[str, Any]], timeout: Optional[float]) -> Dict[str, Any]:
+        model = str(getattr(self._client.spec, "model", ""))
+        key = fixture_key(method, model, system, prompt, schema)
+        if self._mode == "record":
+            if method == "generate_json":
+                result = self._client.generate_json(system, prompt, schema or {}, timeout=timeout)
+            else:
+                result = self._client.generate(system, prompt, timeout=timeout)
+            with _lock:
+                _interactions(self._path).append({"key": key, "method": method, "profile": self._profile, "model": model, "response": result})
+                _save(self._path)
+            return result
+        with _lock:
+            items = _interactions(self._path)
+            used = _used.setdefault(self._path, set())
+            match, how = None, "exact"
+            for i, it in enumerate(items):
+                if i not in used and it.get("key") == key:
+                    match = i
+                    break
+            if match is None:
+                how = "sequence"
+                for i, it in enumerate(items):
+                    if i not in used and it.get("method") == method and it.get("profile") == self._profile:
+                        match = i
+                        break
+            if match is not None:
+                used.add(match)
+        if match is None:
+            log_event("fixture_miss", {"profile": self._profile, "method": method, "key": key}, status="error")
+            mock = BaseClient.generate(self._client, system, prompt)
+            return BaseClient._with_parsed(mock, mode="text", schema=schema) if method == "generate_json" else mock
+        log_event("fixture_replay", {"profile": self._profile, "method": method, "match": how, "key": key})
+        response = {**items[match]["response"], "replayed": True}
+        if method == "generate_json" and "data" not in response:
+            response = BaseClient._with_parsed(response, mode="text", schema=schema)
+        return response
+
+    def generate(self, system: PromptLike, prompt: PromptLike, timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self._call("generate", system, prompt, None, timeout)
+
+    def generate_json(self, system: PromptLike, prompt: PromptLike, schema: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        return self._call("generate_json", system, prompt, schema, timeout)
+
+
+def wrap(client: Any, profile: str) -> Any:
+    """Wrap client when WARP_PROVIDER_FIXTURES is set, else return it unchanged."""
+    path = os.environ.get("WARP_PROVIDER_FIXTURES")
+    if not path or client is None:
+        return client
+    return FixtureClient(client, profile, path, mode=os.environ.get("WARP_PROVIDER_MODE", "replay"))
@@ -1,26 +1,17 @@
 from __future__ import annotations
 from typing import Dict, Any, Optional
 import os
-import requests  # type: ignore
-from .base import BaseClient
+from .base import DEFAULT_TIMEOUT_S, BaseClient, PromptLike, cache_usage, http_session, prompt_text
 
 class GeminiClient(BaseClient):
     def api_key(self) -> Optional[str]:
         return os.environ.get("GOOGLE_API_KEY")
 
-    def generate(self, system: str, prompt: str) -> Dict[str, Any]:
-        key = self.api_key()
-        if not key:
-            return super().generate(system, prompt)
+    def _call(self, key: str, body: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
         model = self.spec.model or "gemini-1.5-pro"
-        url = f"https://generativelanguage.googleapis.com/v1beta/models/{model}:generateContent?key={key}"
+        url = f"{self.base_url('GEMINI_BASE_URL', 'https://generativelanguage.googleapis.com')}/v1beta/models/{model}:generateContent?key={key}"
         headers = {"Content-Type": "application/json"}
-        body = {
-            "contents": [
-                {"role": "user", "parts": [{"text": system + "\n\n" + prompt}]}
-            ]
-        }
-        resp = requests.post(url, headers=headers, json=body, timeout=60)
+        resp = http_session().post(url, headers=headers, json=body, timeout=timeout or DEFAULT_TIMEOUT_S)
         resp.raise_for_status()
         data = resp.json()
         candidates = data.get("candidates") or []
@@ -28,4 +19,29 @@ class GeminiClient(BaseClient):
         if candidates:
             parts = (candidates[0].get("content") or {}).get("parts") or []
             text = "".join(p.get("text", "") for p in parts)
-        return {"text": text, "usage": data.get("usageMetadata", {}), "provider": "gemini", "model": model}
+        usage = data.get("usageMetadata", {})
+        return {"text": text, "usage": usage, "cache": cache_usage(usage), "provider": "gemini", "model": model}
+
+    def _body(self, system: PromptLike, prompt: PromptLike) -> Dict[str, Any]:
+        # Implicit caching keys on the leading tokens: stable segments come first
+        sys_segs, user_segs = self.build_messages(system, prompt)
+        return {
+            "contents": [
+                {"role": "user", "parts": [{"text": prompt_text(sys_segs) + "\n\n" + prompt_text(user_segs)}]}
+            ]
+        }
+
+    def generate(self, system: PromptLike, prompt: PromptLike, timeout: Optional[float] = None) -> Dict[str, Any]:
+        key = self.api_key()
+        if not key:
+            return super().generate(system, prompt, timeout=timeout)
+        return self._call(key, self._body(system, prompt), timeout)
+
+    def generate_json(self, system: PromptLike, prompt: PromptLike, schema: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        key = self.api_key()
+        if not key:
+            return super().generate_json(system, prompt, schema, timeout=timeout)
+        body = self._body(system, prompt)
+        body["generationConfig"] = {"responseMimeType": "application/json", "responseSchema": schema}
+        result = self._call(key, body, timeout)
+        return self._with_parsed(result, mode="native", json_text=result["text"], schema=schema)
@@ -1,29 +1,50 @@
 from __future__ import annotations
 from typing import Dict, Any, Optional
 import os
-import requests  # type: ignore
-from .base import BaseClient
+from .base import DEFAULT_TIMEOUT_S, BaseClient, PromptLike, cache_key, cache_usage, http_session, prompt_text
 
 class OpenAIClient(BaseClient):
     def api_key(self) -> Optional[str]:
         return os.environ.get("OPENAI_API_KEY")
 
-    def generate(self, system: str, prompt: str) -> Dict[str, Any]:
-        key = self.api_key()
-        if not key:
-            return super().generate(system, prompt)
-        url = "https://api.openai.com/v1/chat/completions"
+    def _post(self, key: str, body: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        url = f"{self.base_url('OPENAI_BASE_URL', 'https://api.openai.com/v1')}/chat/completions"
         headers = {"Authorization": f"Bearer {key}", "Content-Type": "application/json"}
+        resp = http_session().post(url, headers=headers, json=body, timeout=timeout or DEFAULT_TIMEOUT_S)
+        resp.raise_for_status()
+        return resp.json()
+
+    def _body(self, system: PromptLike, prompt: PromptLike) -> Dict[str, Any]:
+        # Prefix caching is automatic; stable segments come first and the key routes repeats to the same cache
+        sys_segs, user_segs = self.build_messages(system, prompt)
         body = {
             "model": self.spec.model,
-            "messages": [{"role": "system", "content": system}, {"role": "user", "content": prompt}],
+            "messages": [{"role": "system", "content": prompt_text(sys_segs)}, {"role": "user", "content": prompt_text(user_segs)}],
             "temperature": self.spec.temperature,
             "max_tokens": self.spec.max_tokens,
         }
-        resp = requests.post(url, headers=headers, json=body, timeout=60)
-        resp.raise_for_status()
-        data = resp.json()
+        key = cache_key(system, prompt)
+        if key:
+            body["prompt_cache_key"] = key
+        return body
+
+    def _result(self, data: Dict[str, Any]) -> Dict[str, Any]:
         choice = (data.get("choices") or [{}])[0]
         msg = (choice.get("message") or {}).get("content", "")
         usage = data.get("usage", {})
-        return {"text": msg, "usage": usage, "provider": "openai", "model": self.spec.model}
+        return {"text": msg, "usage": usage, "cache": cache_usage(usage), "provider": "openai", "model": self.spec.model}
+
+    def generate(self, system: PromptLike, prompt: PromptLike, timeout: Optional[float] = None) -> Dict[str, Any]:
+        key = self.api_key()
+        if not key:
+            return super().generate(system, prompt, timeout=timeout)
+        return self._result(self._post(key, self._body(system, prompt), timeout))
+
+    def generate_json(self, system: PromptLike, prompt: PromptLike, schema: Dict[str, Any], timeout: Optional[float] = None) -> Dict[str, Any]:
+        key = self.api_key()
+        if not key:
+            return super().generate_json(system, prompt, schema, timeout=timeout)
+        body = self._body(system, prompt)
+        body["response_format"] = {"type": "json_schema", "json_schema": {"name": "result", "schema": schema}}
+        result = self._result(self._post(key, body, timeout))
+        return self._with_parsed(result, mode="native", json_text=result["text"], schema=schema)
@@ -0,0 +1,379 @@
+"""Warm orchestration daemon (`python -m orchestration serve`) and its thin client.
+
+The daemon keeps a WarmContext (config, model router, git listing) and the
+pooled provider HTTP session alive across goals, and accepts runs over a local
+Unix socket (default) or loopback HTTP.
+
+API (JSON over HTTP/1.0)
+- GET  /health -> {"status": "ok"|"draining", "inflight": n, "warm": {...}}
+- POST /runs   {goal, constraints?, context?, stream?}
+    stream=false -> the run result as one JSON object
+    stream=true  -> NDJSON lines {"event": ev} ... then {"result": result}
+- POST /runs/<runId>/cancel -> {"runId": id, "cancelled": bool}
+    constraints.runId pre-assigns the id of a non-streaming run; streaming
+    callers read it from the "start" event. Runs still in flight when a
+    drain times out are cancelled.
+
+POSTs must be `Content-Type: application/json`; goal must be a string and
+constraints/context objects (else 400). The loopback HTTP listener also
+requires `Authorization: Bearer <token>`, where the token is WARP_ORCH_TOKEN
+or one generated at startup into runtime/orchestration.token (mode 0600),
+so a browser page cannot start or cancel runs with a cross-origin POST.
+The Unix socket relies on file permissions. A second `serve` on a socket a
+live daemon answers exits instead of taking it over.
+"""
+from __future__ import annotations
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterator, Optional, Tuple
+import hmac
+import http.client
+import json
+import os
+import secrets
+import signal
+import socket
+import socketserver
+import threading
+
+from .artifacts import collect_in_background
+from .cancel import active_runs, request_cancel, valid_run_id
+from .graph import run_goal
+from .logging import _runtime_dir, add_listener, log_event, remove_listener
+from .warm import WarmContext
+
+
+def default_socket_path() -> str:
+    return os.environ.get("WARP_ORCH_SOCKET") or os.path.join(_runtime_dir(), "orchestration.sock")
+
+
+def _token_path() -> str:
+    return os.path.join(_runtime_dir(), "orchestration.token")
+
+
+def read_token() -> Optional[str]:
+    """Token for the loopback HTTP listener: WARP_ORCH_TOKEN, else the one the daemon wrote."""
+    token = os.environ.get("WARP_ORCH_TOKEN")
+    if token:
+        return token
+    try:
+        with open(_token_path(), "r", encoding="utf-8") as f:
+            return f.read().strip() or None
+    except OSError:
+        return None
+
+
+def _write_token() -> str:
+    token = os.environ.get("WARP_ORCH_TOKEN") or secrets.token_urlsafe(24)
+    path = _token_path()
+    tmp = f"{path}.{os.getpid()}.tmp"
+    fd = os.open(tmp, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        f.write(token)
+    os.replace(tmp, path)
+    return token
+
+
+def _socket_alive(path: str) -> bool:
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(1.0)
+    try:
+        sock.connect(path)
+        return True
+    except OSError:
+        return False
+    finally:
+        sock.close()
+
+
+class _BadRequest(ValueError):
+    pass
+
+
+# Numeric constraints run_goal converts with int()/float(): reject bad values up front (400, not 500)
+_NUMERIC_CONSTRAINTS = ("retries", "deadline_s", "deadline", "approval_timeout")
+
+
+def _check_constraints(constraints: Dict[str, Any]) -> None:
+    for name in _NUMERIC_CONSTRAINTS:
+        value = constraints.get(name)
+        if value is None:
+            continue
+        if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value or value < 0:
+            raise _BadRequest(f"constraints.{name} must be a non-negative number")
+        if name == "retries" and int(value) != value:
+            raise _BadRequest("constraints.retries must be an integer")
+    if constraints.get("runId") is not None and not valid_run_id(constraints["runId"]):
+        raise _BadRequest("constraints.runId is not a valid run id")
+
+
+def _parse_run(req: Any) -> Tuple[str, Dict[str, Any], Dict[str, Any]]:
+    if not isinstance(req, dict):
+        raise _BadRequest("body must be a JSON object")
+    goal = req.get("goal", "")
+    if not isinstance(goal, str):
+        raise _BadRequest("goal must be a string")
+    constraints = req.get("constraints")
+    context = req.get("context")
+    for name, value in (("constraints", constraints), ("context", context)):
+        if value is not None and not isinstance(value, dict):
+            raise _BadRequest(f"{name} must be an object")
+    _check_constraints(constraints or {})
+    return goal, dict(constraints or {}), dict(context or {})
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+class OrchestrationServer:
+    def __init__(self, warm: Optional[WarmContext] = None, socket_path: Optional[str] = None, host: str = "127.0.0.1", port: Optional[int] = None):
+        self.warm = warm or WarmContext()
+        self.socket_path = None if port is not None else (socket_path or default_socket_path())
+        self.host = host
+        self.port = port
+        self._inflight = 0
+        self._cond = threading.Condition()
+        self._draining = False
+        self._stop = threading.Event()
+        self._httpd: Optional[socketserver.BaseServer] = None
+        self.token: Optional[str] = None  # required on the HTTP listener
+
+    # -- runs -------------------------------------------------------------
+    def run(self, goal: str, constraints: Optional[Dict[str, Any]] = None, context: Optional[Dict[str, Any]] = None, on_event: Optional[Callable[[Dict[str, Any]], None]] = None) -> Dict[str, Any]:
+        with self._cond:
+            if self._draining:
+                raise RuntimeError("server is draining")
+            self._inflight += 1
+        ident = threading.get_ident()
+
+        def _listener(ev: Dict[str, Any]) -> None:
+            if on_event is not None and threading.get_ident() == ident:
+                on_event(ev)
+
+        add_listener(_listener)
+        try:
+            self.warm.refresh()
+            return run_goal(goal, constraints=constraints, context=context, warm=self.warm)
+        finally:
+            remove_listener(_listener)
+            with self._cond:
+                self._inflight -= 1
+                self._cond.notify_all()
+
+    def health(self) -> Dict[str, Any]:
+        return {"status": "draining" if self._draining else "ok", "inflight": self._inflight, "warm": self.warm.info()}
+
+    # -- lifecycle --------------------------------------------------------
+    def _make_httpd(self) -> socketserver.BaseServer:
+        handler = _make_handler(self)
+        if self.socket_path:
+            if os.path.exists(self.socket_path):
+                if _socket_alive(self.socket_path):
+                    raise RuntimeError(f"a daemon is already serving on {self.socket_path}")
+                os.unlink(self.socket_path)  # stale socket from a previous crash
+            return _UnixHTTPServer(self.socket_path, handler)
+        self.token = _write_token()
+        return ThreadingHTTPServer((self.host, int(self.port or 0)), handler)
+
+    def address(self) -> str:
+        if self.socket_path:
+            return f"unix:{self.socket_path}"
+        host, port = self._httpd.server_address[:2] if self._httpd else (self.host, self.port)  # type: ignore[misc]
+        return f"http://{host}:{port}"
+
+    def start(self) -> None:
+        self._httpd = self._make_httpd()
+        threading.Thread(target=self._httpd.serve_forever, name="orchestration-serve", daemon=True).start()
+        log_event("serve_started", {"address": self.address(), "pid": os.getpid()})
+
+    def stop(self, drain_timeout: float = 300.0) -> None:
+        """Stop accepting runs, wait for in-flight runs to finish, then close."""
+        with self._cond:
+            self._draining = True
+        log_event("serve_draining", {"inflight": self._inflight})
+        if self._httpd is not None:
+            self._httpd.shutdown()
+        with self._cond:
+            self._cond.wait_for(lambda: self._inflight == 0, timeout=drain_timeout)
+            left = self._inflight
+        if left:
+            for run_id in active_runs():
+                request_cancel(run_id)
+            with self._cond:  # runs stop at their next cancellation point
+                self._cond.wait_for(lambda: self._inflight == 0, timeout=10.0)
+        if self._httpd is not None:
+            self._httpd.server_close()
+        if self.socket_path and os.path.exists(self.socket_path):
+            try:
+                os.unlink(self.socket_path)
+            except OSError:
+                pass
+        log_event("serve_stopped", {"abandoned": left})
+
+    def serve_forever(self, drain_timeout: float = 300.0) -> None:
+        """Blocking entry point: serve until SIGINT/SIGTERM, then drain."""
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            try:
+                signal.signal(sig, lambda *_: self._stop.set())
+            except (ValueError, OSError):  # pragma: no cover - not main thread / unsupported
+                pass
+        self.start()
+        print(json.dumps({"serving": self.address()}), flush=True)
+        while not self._stop.wait(0.5):
+            if self._inflight == 0:
+                collect_in_background()
+        self.stop(drain_timeout=drain_timeout)
+
+
+def _make_handler(server: OrchestrationServer):
+    class _Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args: Any) -> None:  # keep stderr quiet; events.jsonl is the log
+            pass
+
+        def _json(self, code: int, payload: Dict[str, Any]) -> None:
+            body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self) -> None:
+            if self.path == "/health":
+                return self._json(200, server.health())
+            self._json(404, {"error": "not found"})
+
+        def _authorized(self) -> bool:
+            if server.token is None:
+                return True
+            auth = self.headers.get("Authorization") or ""
+            return auth.startswith("Bearer ") and hmac.compare_digest(auth[len("Bearer "):].strip(), server.token)
+
+        def do_POST(self) -> None:
+            if not self._authorized():
+                return self._json(401, {"error": "missing or invalid token"})
+            if (self.headers.get("Content-Type") or "").split(";")[0].strip().lower() != "application/json":
+                return self._json(415, {"error": "Content-Type must be application/json"})
+            parts = self.path.strip("/").split("/")
+            if len(parts) == 3 and parts[0] == "runs" and parts[2] == "cancel":
+                return self._json(200, {"runId": parts[1], "cancelled": request_cancel(parts[1])})
+            if self.path != "/runs":
+                return self._json(404, {"error": "not found"})
+            try:
+                length = int(self.headers.get("Content-Length") or 0)
+                req = json.loads(self.rfile.read(length) or b"{}")
+                goal, constraints, context = _parse_run(req)
+            except Exception as e:
+                return self._json(400, {"error": f"invalid request: {e}"})
+            if server._draining:
+                return self._json(503, {"error": "server is draining"})
+            if not req.get("stream"):
+                try:
+                    result = server.run(goal, constraints, context)
+                except RuntimeError as e:
+                    return self._json(503, {"error": str(e)})
+                except Exception as e:
+                    return self._json(500, {"error": f"{type(e).__name__}: {e}"})
+                return self._json(200, result)
+
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson")
+            self.end_headers()
+
+            def _emit(payload: Dict[str, Any]) -> None:
+                try:
+                    self.wfile.write((json.dumps(payload, ensure_ascii=False, default=str) + "\n").encode("utf-8"))
+                    self.wfile.flush()
+                except OSError:
+                    pass  # caller went away; the run still completes
+
+            try:
+                result = server.run(goal, constraints, context, on_event=lambda ev: _emit({"event": ev}))
+                _emit({"result": result})
+            except Exception as e:
+                _emit({"error": str(e) if isinstance(e, RuntimeError) else f"{type(e).__name__}: {e}"})
+
+    return _Handler
+
+
+# -- client ---------------------------------------------------------------
+
+class _UnixHTTPConnection(http.client.HTTPConnection):
+    def __init__(self, path: str, timeout: Optional[float] = None):
+        super().__init__("localhost", timeout=timeout)
+        self._path = path
+
+    def connect(self) -> None:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        if self.timeout is not None:
+            sock.settimeout(self.timeout)
+        sock.connect(self._path)
+        self.sock = sock
+
+
+def _headers() -> Dict[str, str]:
+    headers = {"Content-Type": "application/json"}
+    token = read_token()
+    if token:
+        headers["Authorization"] = f"Bearer {token}"
+    return headers
+
+
+def _connect(address: Optional[str], timeout: Optional[float]) -> http.client.HTTPConnection:
+    address = address or f"unix:{default_socket_path()}"
+    if address.startswith("unix:"):
+        return _UnixHTTPConnection(address[len("unix:"):], timeout=timeout)
+    rest = address.split("://", 1)[-1].rstrip("/")
+    host, _, port = rest.partition(":")
+    return http.client.HTTPConnection(host, int(port or 80), timeout=timeout)
+
+
+def submit(goal: str, constraints: Optional[Dict[str, Any]] = None, context: Optional[Dict[str, Any]] = None, address: Optional[str] = None, timeout: Optional[float] = None) -> Dict[str, Any]:
+    """Run a goal on the daemon and return its result."""
+    conn = _connect(address, timeout)
+    try:
+        body = json.dumps({"goal": goal, "constraints": constraints or {}, "context": context or {}})
+        conn.request("POST", "/runs", body=body, headers=_headers())
+        resp = conn.getresponse()
+        payload = json.loads(resp.read() or b"{}")
+        if resp.status != 200:
+            raise RuntimeError(payload.get("error") or f"HTTP {resp.status}")
+        return payload
+    finally:
+        conn.close()
+
+
+def stream(goal: str, constraints: Optional[Dict[str, Any]] = None, context: Optional[Dict[str, Any]] = None, address: Optional[str] = None, timeout: Optional[float] = None) -> Iterator[Dict[str, Any]]:
+    """Run a goal on the daemon, yielding {"event": ...} lines then {"result": ...}."""
+    conn = _connect(address, timeout)
+    try:
+        body = json.dumps({"goal": goal, "constraints": constraints or {}, "context": context or {}, "stream": True})
+        conn.request("POST", "/runs", body=body, headers=_headers())
+        resp = conn.getresponse()
+        if resp.status != 200:
+            payload = json.loads(resp.read() or b"{}")
+            raise RuntimeError(payload.get("error") or f"HTTP {resp.status}")
+        for line in resp:
+            if line.strip():
+                yield json.loads(line)
+    finally:
+        conn.close()
+
+
+def cancel(run_id: str, address: Optional[str] = None, timeout: Optional[float] = 5.0) -> Dict[str, Any]:
+    """Ask the daemon to cancel a run; "cancelled" is True if it was in flight there."""
+    conn = _connect(address, timeout)
+    try:
+        conn.request("POST", f"/runs/{run_id}/cancel", body=b"{}", headers=_headers())
+        return json.loads(conn.getresponse().read() or b"{}")
+    finally:
+        conn.close()
+
+
+def health(address: Optional[str] = None, timeout: Optional[float] = 5.0) -> Dict[str, Any]:
+    conn = _connect(address, timeout)
+    try:
+        conn.request("GET", "/health")
+        return json.loads(conn.getresponse().read() or b"{}")
+    finally:
+        conn.close()
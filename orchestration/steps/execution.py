@@ -4,6 +4,8 @@ import os
 from fnmatch import fnmatch
 from ..logging import log_event
 from ..agents.concrete.executor import Executor
+from ..config import policy_version
+from .. import approvals as approval_cache
 import uuid
 
 
@@ -15,15 +17,19 @@ def execute_step(state: Dict[str, Any]) -> Dict[str, Any]:
 
     # Pattern 4: planning/execution separation
     actions: List[Dict[str, Any]] = []
+    degraded = False
     try:
-        agent = Executor()
+        warm = state.get("warm")
+        agent = Executor(router=warm.router if warm else None, cancel=state.get("cancel"))
         res = agent.run(state.get("plan", []))
+        degraded = bool(res.get("degraded"))
         model_actions = res.get("actions", {})
         # Normalize into our internal format
         for cmd in (model_actions.get("posix") or []):
             actions.append({"id": str(uuid.uuid4()), "name": "model", "cmd": cmd, "paths": [], "dry_run": True})
     except Exception:
         # fallback deterministic proposals
+        degraded = True
         actions = [
             {"id": str(uuid.uuid4()), "name": "build(frontend)", "cmd": ["bash", "05_WORKFLOWS/slash-commands/build/build.sh"], "paths": ["tools/dashboard/**"], "dry_run": True},
             {"id": str(uuid.uuid4()), "name": "test", "cmd": ["bash", "05_WORKFLOWS/slash-commands/test/test.sh"], "paths": ["tests/**", "**/*.py"], "dry_run": True},
@@ -71,9 +77,24 @@ def execute_step(state: Dict[str, Any]) -> Dict[str, Any]:
 
     proposed = {"posix": actions, "windows": actions_ps}
     # Pattern 7: Approval gate pyramid (simulation)
+    # Manual actions a human already approved (same cmd, paths, policy and repo revision) are pre-cleared
     approvals = []
-    for a in actions:
-        if a.get("approval") == "manual":
-            approvals.append({"actionId": a.get("id"), "action": a["name"], "cmd": a.get("cmd"), "reason": "matches manual_required_globs", "confirmation_phrase": "I APPROVE THIS CRITICAL ACTION"})
-    status = "awaiting_approval" if approvals else "actions_proposed"
-    return {"actions": proposed, "approvals": approvals, "status": status}
+    preapproved = []
+    manual = [a for a in actions if a.get("approval") == "manual"]
+    policy = policy_version(cfg)
+    revision = approval_cache.repo_revision() if manual else ""  # git calls only when something needs approval
+    reuse = bool((state.get("constraints") or {}).get("reuse_approvals", True))
+    run_id, session_id = state.get("runId"), approval_cache.session_of(state)
+    for a in manual:
+        fp = approval_cache.fingerprint(a.get("cmd"), a.get("paths"), policy, revision)
+        decision = approval_cache.lookup(fp, run_id, session_id) if reuse else None
+        if decision is not None:
+            preapproved.append({"actionId": a.get("id"), "fingerprint": fp, "decisionId": decision.id})
+            log_event("approval_reused", {"runId": run_id, "actionId": a.get("id"), "cmd": a.get("cmd"), "paths": a.get("paths"), "fingerprint": fp, "decisionId": decision.id, "scope": decision.scope, "grantedBy": decision.granted_by, "grantedAt": decision.granted_at, "expiresAt": decision.expires_at}, phase="execute")
+            continue
+        approvals.append({"actionId": a.get("id"), "action": a["name"], "cmd": a.get("cmd"), "paths": a.get("paths"), "fingerprint": fp, "policy": policy, "revision": revision, "reason": "matches manual_required_globs", "confirmation_phrase": "I APPROVE THIS CRITICAL ACTION"})
+    status = "awaiting_approval" if approvals else ("approved" if preapproved else "actions_proposed")
+    updates = {"actions": proposed, "approvals": approvals, "preapproved": preapproved, "status": status}
+    if degraded:  # fallback proposals: usable for this run, never memoized
+        updates["degraded"] = [*(state.get("degraded") or []), "execute_step"]
+    return updates
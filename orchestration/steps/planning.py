@@ -1,33 +1,67 @@
 from __future__ import annotations
-from typing import Any, Dict, List
+from typing import Any, Dict, List, Optional
 import os
 import subprocess
+import time
 from ..agents.concrete.planner import Planner
+from ..index import TrigramIndex, git_head
 from ..logging import log_event
 
-def _git_top_dirs(root: str) -> List[str]:
+def _git_files(root: str) -> List[str]:
     try:
         out = subprocess.check_output(["git", "--no-pager", "ls-files"], cwd=root, text=True)
-        paths = [p.strip() for p in out.splitlines() if p.strip()]
+        return [p.strip() for p in out.splitlines() if p.strip()]
+    except Exception:
+        return []
+
+
+def _git_top_dirs(root: str, paths: Optional[List[str]] = None) -> List[str]:
+    try:
+        if paths is None:
+            paths = _git_files(root)
         top = sorted({p.split("/")[0] for p in paths if "/" in p})
         return top
     except Exception:
         return []
 
 
+def _relevant(root: str, goal: str, paths: Optional[List[str]], warm: Any) -> List[Dict[str, Any]]:
+    """Rank tracked files for the goal with the trigram index (Pattern 3); [] on any failure."""
+    try:
+        if paths is None:
+            paths = _git_files(root)
+        index = warm.index if warm else TrigramIndex(root)
+        build = index.update(paths, head=warm.git_head if warm else git_head(root))
+        if build.get("changed") or build.get("removed"):
+            log_event("index_built", build, phase="plan")
+        t0 = time.perf_counter()
+        hits = [h.to_dict() for h in index.search(goal)]
+        log_event("index_query", {"query_ms": round((time.perf_counter() - t0) * 1000.0, 2), "hits": len(hits), "files": build.get("files"), "index_bytes": build.get("index_bytes")}, phase="plan")
+        if not warm:
+            index.close()
+        return hits
+    except Exception:
+        return []
+
+
 def plan_step(state: Dict[str, Any]) -> Dict[str, Any]:
     goal = state.get("goal", "")
     root = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
-    top_dirs = _git_top_dirs(root)
+    warm = state.get("warm")
+    files = warm.git_files if warm else _git_files(root)  # one listing for both (one-shot runs have no warm cache)
+    top_dirs = _git_top_dirs(root, files)
+    relevant = _relevant(root, goal, files, warm)
 
     # Try concrete planner via model routing; fallback to deterministic plan
+    degraded = False
     try:
-        agent = Planner()
-        res = agent.run(goal, top_dirs)
+        agent = Planner(router=warm.router if warm else None, cancel=state.get("cancel"))
+        res = agent.run(goal, top_dirs, relevant)
         steps = res.get("steps") or []
         if steps:
             plan = steps
         else:
+            degraded = True
             plan = [
                 f"Understand goal: {goal}",
                 "Index codebase (git ls-files) and extract relevant paths",
@@ -36,6 +70,7 @@ def plan_step(state: Dict[str, Any]) -> Dict[str, Any]:
             ]
         log_event("plan_built", {"count": len(plan)}, phase="plan")
     except Exception:
+        degraded = True
         plan = [
             f"Understand goal: {goal}",
             "Index codebase (git ls-files) and extract relevant paths",
@@ -44,9 +79,13 @@ def plan_step(state: Dict[str, Any]) -> Dict[str, Any]:
         ]
     context = {
         "top_dirs": top_dirs,
-        "files_hint": ["README.md", ".github/workflows/ci.yml", "WARP.md"],
+        "files_hint": [h["path"] for h in relevant] or ["README.md", ".github/workflows/ci.yml", "WARP.md"],
+        "relevant": relevant,
     }
     # Pattern 11: command history mining seed
     history_entry = {"phase": "planning", "goal": goal, "top_dirs": top_dirs}
     (state.setdefault("history", [])).append(history_entry)
-    return {"plan": plan, "context": {**state.get("context", {}), **context}, "status": "planned", "history": state.get("history")}
+    updates = {"plan": plan, "context": {**state.get("context", {}), **context}, "status": "planned", "history": state.get("history")}
+    if degraded:  # fallback plan: usable for this run, never memoized
+        updates["degraded"] = [*(state.get("degraded") or []), "plan_step"]
+    return updates
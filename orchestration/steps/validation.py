@@ -1,7 +1,6 @@
 from __future__ import annotations
 from typing import Any, Dict
 import os
-import json
 import shutil
 import subprocess
 from ..agents.concrete.validator import Validator
@@ -31,29 +30,17 @@ def validate_step(state: Dict[str, Any]) -> Dict[str, Any]:
         raise RuntimeError("simulated validation error")
 
     # Summarize with concrete validator agent
+    degraded = False
     try:
-        agent = Validator()
+        warm = state.get("warm")
+        agent = Validator(router=warm.router if warm else None, cancel=state.get("cancel"))
         res = agent.run(summary)
         summary["bullets"] = res.get("bullets", [])
         log_event("validation_summary", {"len": len(summary.get("bullets", []))}, phase="validate")
     except Exception:
-        pass
+        degraded = True
 
-    # Write plan.md if a plan exists (Pattern 1 output artifact)
-    try:
-        runtime = os.path.join(os.path.dirname(os.path.dirname(__file__)), "runtime")
-        os.makedirs(runtime, exist_ok=True)
-        out = os.path.join(runtime, "plan.md")
-        payload = {
-            "goal": state.get("goal"),
-            "plan": state.get("plan", []),
-            "actions": state.get("actions", {}),
-            "validation": summary,
-        }
-        with open(out, "w", encoding="utf-8") as f:
-            f.write("# Plan\n\n")
-            f.write(json.dumps(payload, indent=2))
-    except Exception:
-        pass
-
-    return {"validation": summary, "status": "validated"}
+    updates: Dict[str, Any] = {"validation": summary, "status": "validated"}
+    if degraded:  # summary without the validator's bullets; never memoized
+        updates["degraded"] = [*(state.get("degraded") or []), "validate_step"]
+    return updates
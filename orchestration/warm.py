@@ -0,0 +1,120 @@
+from __future__ import annotations
+from typing import Any, Dict, List, Optional, Tuple
+import os
+import subprocess
+import threading
+import uuid
+
+from .config import AgentConfig, load_agent_config
+from .index import TrigramIndex, git_head
+from .logging import log_event
+from .models.router import ModelRouter
+
+
+class WarmContext:
+    """Process-lifetime cache of config, model router and git file listing.
+
+    Used by `orchestration serve` so each goal skips the startup work that a
+    one-shot CLI run pays. `refresh()` is cheap (a handful of stat calls) and
+    reloads only what changed on disk:
+    - .warp/agent-config.yml -> agent config
+    - .warp/models/*.yml     -> model router (profiles)
+    - .git/index, .git/HEAD  -> git ls-files listing and HEAD commit
+    The trigram index is opened once and kept mapped; plan_step updates it
+    incrementally (only files git reports as changed) before each query.
+    """
+
+    def __init__(self, root: Optional[str] = None):
+        self.root = root or os.path.dirname(os.path.dirname(__file__))
+        self._lock = threading.Lock()
+        self._config_sig: Optional[Tuple] = None
+        self._models_sig: Optional[Tuple] = None
+        self._git_sig: Optional[Tuple] = None
+        self._config: AgentConfig = AgentConfig()
+        self._router: Optional[ModelRouter] = None
+        self._git_files: List[str] = []
+        self._git_head: Optional[str] = None
+        self._index: Optional[TrigramIndex] = None
+        self.version = 0
+        self.session_id = uuid.uuid4().hex[:16]  # approval-cache "session" scope for runs in this process
+        self.refresh()
+
+    @staticmethod
+    def _stat_sig(paths: List[str]) -> Tuple:
+        sig = []
+        for p in paths:
+            try:
+                st = os.stat(p)
+                sig.append((p, st.st_mtime_ns, st.st_size))
+            except OSError:
+                sig.append((p, None, None))
+        return tuple(sig)
+
+    def _models_paths(self) -> List[str]:
+        models_dir = os.path.join(self.root, ".warp", "models")
+        try:
+            return sorted(os.path.join(models_dir, n) for n in os.listdir(models_dir) if n.endswith(".yml"))
+        except OSError:
+            return []
+
+    def refresh(self) -> bool:
+        """Reload anything whose source files changed; return True if something was reloaded."""
+        with self._lock:
+            reloaded: List[str] = []
+            config_sig = self._stat_sig([os.path.join(self.root, ".warp", "agent-config.yml")])
+            if config_sig != self._config_sig:
+                self._config = load_agent_config(self.root)
+                self._config_sig = config_sig
+                reloaded.append("agent-config")
+            models_sig = self._stat_sig(self._models_paths())
+            if models_sig != self._models_sig or self._router is None:
+                if self._router is not None:
+                    self._router.flush()  # don't drop samples queued on the router being replaced
+                self._router = ModelRouter(os.path.join(self.root, "orchestration"))
+                self._models_sig = models_sig
+                reloaded.append("models")
+            git_sig = self._stat_sig([os.path.join(self.root, ".git", "index"), os.path.join(self.root, ".git", "HEAD")])
+            if git_sig != self._git_sig:
+                self._git_files = _git_ls_files(self.root)
+                self._git_head = git_head(self.root)
+                self._git_sig = git_sig
+                reloaded.append("git")
+            if reloaded:
+                self.version += 1
+                if self.version > 1:
+                    log_event("config_reloaded", {"reloaded": reloaded, "version": self.version})
+            return bool(reloaded)
+
+    @property
+    def config(self) -> AgentConfig:
+        return self._config
+
+    @property
+    def router(self) -> ModelRouter:
+        return self._router  # type: ignore[return-value]
+
+    @property
+    def git_files(self) -> List[str]:
+        return self._git_files
+
+    @property
+    def git_head(self) -> Optional[str]:
+        return self._git_head
+
+    @property
+    def index(self) -> TrigramIndex:
+        with self._lock:
+            if self._index is None:
+                self._index = TrigramIndex(self.root)
+            return self._index
+
+    def info(self) -> Dict[str, Any]:
+        return {"root": self.root, "version": self.version, "sessionId": self.session_id, "profiles": sorted(self._router._profiles) if self._router else [], "files": len(self._git_files)}
+
+
+def _git_ls_files(root: str) -> List[str]:
+    try:
+        out = subprocess.check_output(["git", "--no-pager", "ls-files"], cwd=root, text=True)
+        return [p.strip() for p in out.splitlines() if p.strip()]
+    except Exception:
+        return []
@@ -2,7 +2,7 @@
 const state = { events: [], counters: { total:0, errors:0, approvals:0 }, last: {}, approvals: [], kpiWindow:'15m', kpiRunId:'', kpi:null };
 
 function badge(cls, text){ return `<span class="badge ${cls}">${text}</span>` }
-function clsFor(ev){ if(ev.status==='error') return 'err'; if(ev.status==='awaiting_approval') return 'warn'; if(ev.status==='validated'||ev.kind==='end') return 'ok'; return 'info'; }
+function clsFor(ev){ if(ev.status==='error') return 'err'; if(ev.status==='awaiting_approval' || ev.kind==='run_cancelled') return 'warn'; if(ev.status==='validated'||ev.kind==='end') return 'ok'; return 'info'; }
 
 function updateOverview(){
   const el = document.getElementById('overview');
@@ -76,6 +76,7 @@ function applyCounters(ev){
   state.counters.total++;
   if(ev.status==='error') state.counters.errors++;
   if(ev.kind==='action_proposed' && (ev.data?.approval==='manual')){ state.counters.approvals++; state.approvals.push(ev); renderApprovals(); }
+  if(ev.kind==='approval_reused' && ev.data?.actionId){ state.approvals = state.approvals.filter(ap=>(ap.data?.actionId||ap.actionId)!==ev.data.actionId); renderApprovals(); }
   if(ev.phase) state.last.phase = ev.phase;
 }
 
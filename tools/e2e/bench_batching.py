@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Compare direct vs Message Batches provider calls against the local stub.
+
+N threads each send `--calls` generate requests for one profile through
+ModelRouter, first with batching off and then on (WARP_BATCH=1). Reports the
+HTTP requests, model replies and batches the stub saw, per-call p50/p95
+latency and wall time. Batched calls are billed at the batch discount but wait
+for the batch (`--batch-latency-ms` on the stub), so the point is fewer, denser
+requests for work that can wait (queue jobs), not lower latency. Results are
+checked: each caller must get the reply to its own prompt.
+
+    python tools/e2e/bench_batching.py --threads 16 --calls 4 --window-ms 100 --batch-latency-ms 300
+"""
+from __future__ import annotations
+from typing import Any, Dict, List
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+from stub_provider import StubProvider  # noqa: E402
+
+
+def _pct(values: List[float], p: float) -> float:
+    values = sorted(values)
+    return round(values[min(len(values) - 1, int(p * len(values)))], 1) if values else 0.0
+
+
+def _round(stub: StubProvider, batch: bool, args: argparse.Namespace) -> Dict[str, Any]:
+    from orchestration.models.router import ModelRouter
+
+    if batch:
+        os.environ.update({"WARP_BATCH": "1", "WARP_BATCH_WINDOW_MS": str(args.window_ms), "WARP_BATCH_MAX": str(args.max_batch), "WARP_BATCH_POLL_S": str(args.poll_s)})
+    else:
+        os.environ.pop("WARP_BATCH", None)
+    router = ModelRouter(stats_path=os.path.join(args.tmp, "router-stats.json"))
+    stub.reset()
+    latencies: List[float] = []
+    wrong = 0
+    lock = threading.Lock()
+
+    def _worker(i: int) -> None:
+        nonlocal wrong
+        for j in range(args.calls):
+            client = router.get_client(args.profile)
+            prompt = f"caller {i} call {j}"
+            t0 = time.perf_counter()
+            result = client.generate("stub system", prompt)
+            ms = (time.perf_counter() - t0) * 1000.0
+            with lock:
+                latencies.append(ms)
+                if prompt not in result.get("text", ""):
+                    wrong += 1
+
+    t0 = time.perf_counter()
+    pool = [threading.Thread(target=_worker, args=(i,)) for i in range(args.threads)]
+    for t in pool:
+        t.start()
+    for t in pool:
+        t.join()
+    wall = time.perf_counter() - t0
+    return {
+        "batching": batch,
+        **stub.stats(),
+        "p50_ms": _pct(latencies, 0.5),
+        "p95_ms": _pct(latencies, 0.95),
+        "wall_s": round(wall, 2),
+        "misrouted": wrong,
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--calls", type=int, default=4)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--batch-latency-ms", type=float, default=300.0)
+    parser.add_argument("--window-ms", type=float, default=100.0)
+    parser.add_argument("--max-batch", type=int, default=64)
+    parser.add_argument("--poll-s", type=float, default=0.1)
+    parser.add_argument("--profile", default="claude-execution")
+    args = parser.parse_args()
+    args.tmp = tempfile.mkdtemp(prefix="warp-bench-")
+    stub = StubProvider(args.latency_ms, batch_latency_ms=args.batch_latency_ms).start()
+    os.environ["ANTHROPIC_BASE_URL"] = stub.url
+    os.environ["ANTHROPIC_API_KEY"] = "stub-key"
+    os.environ["WARP_RUNTIME_DIR"] = args.tmp
+    try:
+        for batch in (False, True):
+            print(json.dumps(_round(stub, batch, args)), flush=True)
+    finally:
+        stub.stop()
+        shutil.rmtree(args.tmp, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Measure job-queue drain time for 1 vs N worker threads.
+
+`--jobs` jobs are enqueued into a fresh queue under a temp runtime dir and
+drained by run_workers-style threads (exit when idle), first with one worker
+and then with `--concurrency`. Runs use the keyless mock provider; each run
+also sleeps `--run-ms` to stand in for provider latency, so the numbers show
+queue overhead and worker scaling rather than model speed. Also reports
+attempts > 1 (re-deliveries) and jobs not done.
+
+    python tools/e2e/bench_jobqueue.py --jobs 20 --concurrency 4 --run-ms 200
+"""
+from __future__ import annotations
+from typing import Any, Dict
+import argparse
+import json
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+
+def _round(concurrency: int, args: argparse.Namespace) -> Dict[str, Any]:
+    from orchestration.jobqueue import JobQueue, run_worker
+
+    path = os.path.join(args.tmp, f"jobs-{concurrency}.sqlite3")
+    queue = JobQueue(path)
+    ids = [queue.enqueue(f"bench job {i}") for i in range(args.jobs)]
+    t0 = time.perf_counter()
+    workers = [
+        threading.Thread(target=run_worker, args=(queue,), kwargs={"worker": f"bench-{i}", "lease_s": args.lease_s, "poll_s": 0.05, "exit_when_idle": True})
+        for i in range(concurrency)
+    ]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    wall = time.perf_counter() - t0
+    jobs = [queue.get(i) for i in ids]
+    return {
+        "concurrency": concurrency,
+        "jobs": args.jobs,
+        "wall_s": round(wall, 2),
+        "jobs_per_s": round(args.jobs / wall, 1),
+        "redelivered": sum(1 for j in jobs if j is not None and j.attempts > 1),
+        "not_done": sum(1 for j in jobs if j is None or j.status != "done"),
+    }
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=20)
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--run-ms", type=float, default=200.0)
+    parser.add_argument("--lease-s", type=float, default=30.0)
+    args = parser.parse_args()
+    args.tmp = tempfile.mkdtemp(prefix="warp-bench-")
+    os.environ["WARP_RUNTIME_DIR"] = args.tmp
+    for var in ("ANTHROPIC_API_KEY", "OPENAI_API_KEY", "GOOGLE_API_KEY", "WARP_PROVIDER_FIXTURES"):
+        os.environ.pop(var, None)
+
+    from orchestration import graph
+
+    real_run_goal = graph.run_goal
+
+    def _slow_run_goal(*a: Any, **kw: Any) -> Dict[str, Any]:
+        time.sleep(args.run_ms / 1000.0)
+        return real_run_goal(*a, **kw)
+
+    graph.run_goal = _slow_run_goal  # run_worker imports it when it starts
+    try:
+        for concurrency in sorted({1, args.concurrency}):
+            print(json.dumps(_round(concurrency, args)), flush=True)
+    finally:
+        graph.run_goal = real_run_goal
+        shutil.rmtree(args.tmp, ignore_errors=True)
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
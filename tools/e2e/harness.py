@@ -0,0 +1,355 @@
+#!/usr/bin/env python3
+"""Parallel, isolated, replayable e2e scenario harness.
+
+Scenarios are JSON files under tools/e2e/scenarios/ (one per file):
+
+    {
+      "name": "happy",                      # default: file name
+      "runs": [{"goal": "...", "constraints": {}, "context": {}}],
+      "fixtures": "fixtures/happy.json",    # recorded provider replies (optional)
+      "approve": true,                      # grant approvals as soon as a run waits
+                                            # ({"scope": "session", "ttl_s": 60} adds grant fields,
+                                            #  "delay_s" grants after a delay)
+      "queue": {                            # run jobs through the job queue (optional)
+        "jobs": [{"goal": "...", "constraints": {}, "context": {}}],
+        "lease_s": 0.6, "workers": 1,
+        "abandon": 1,                       # jobs claimed by a worker that then crashes
+        "fail_heartbeats_on_attempt": 1     # heartbeats raise "database is locked"
+      },
+      "expect": {
+        "status": "validated",              # every run, or a list with one entry per run
+        "sequence": ["start", {"kind": "transition", "phase": "plan_step"}, "end"],
+        "absent": ["error"],                # event kinds that must not appear
+        "counts": {"cache_hit": 3}          # exact number of events of a kind
+      }
+    }
+
+`sequence` is an ordered subsequence of the scenario's events; an entry is an
+event kind or a partial event ({kind, phase, status, data: {...}}). Queue jobs
+append the status of their stored result to the run statuses.
+
+Each scenario runs with WARP_RUNTIME_DIR pointing at its own directory, so
+events, artifacts, memo cache and cancel flags never mix. The trigram index
+is built once and hard-linked into every scenario. Scenarios are spread
+over worker processes (--jobs, default: CPU count) and replay provider
+fixtures with API keys removed, so results do not depend on the network.
+`--record` calls the live providers instead and rewrites the fixtures.
+
+Outputs: runtime/scenarios/<name>.jsonl (event snapshot per scenario) and
+runtime/scenarios/report.json (per-scenario/per-node timings, failures).
+
+    python tools/e2e/harness.py [name ...] [--jobs N] [--record] [--keep]
+"""
+from __future__ import annotations
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Dict, List, Optional
+import argparse
+import fnmatch
+import json
+import os
+import shutil
+import sys
+import sqlite3
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+if ROOT not in sys.path:
+    sys.path.insert(0, ROOT)
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+SCENARIOS_DIR = os.path.join(HERE, "scenarios")
+OUT_DIR = os.path.join(ROOT, "runtime", "scenarios")
+_KEY_VARS = ("ANTHROPIC_API_KEY", "OPENAI_API_KEY", "GOOGLE_API_KEY")
+
+
+def discover(names: Optional[List[str]] = None, directory: str = SCENARIOS_DIR) -> List[Dict[str, Any]]:
+    """Load scenario definitions, filtered by name or glob."""
+    specs: List[Dict[str, Any]] = []
+    for fname in sorted(os.listdir(directory)):
+        if not fname.endswith(".json"):
+            continue
+        with open(os.path.join(directory, fname), "r", encoding="utf-8") as f:
+            spec = json.load(f)
+        spec.setdefault("name", os.path.splitext(fname)[0])
+        spec["_dir"] = directory
+        if names and not any(fnmatch.fnmatch(spec["name"], n) for n in names):
+            continue
+        specs.append(spec)
+    return specs
+
+
+# -- assertions ---------------------------------------------------------------
+
+def _matches(ev: Dict[str, Any], want: Any) -> bool:
+    if isinstance(want, str):
+        return ev.get("kind") == want
+    for key, value in want.items():
+        if key == "data":
+            data = ev.get("data") or {}
+            if any(data.get(k) != v for k, v in value.items()):
+                return False
+        elif ev.get(key) != value:
+            return False
+    return True
+
+
+def check(events: List[Dict[str, Any]], statuses: List[Optional[str]], expect: Dict[str, Any]) -> List[str]:
+    failures: List[str] = []
+    want_status = expect.get("status")
+    if want_status is not None:
+        wanted = want_status if isinstance(want_status, list) else [want_status] * len(statuses)
+        if list(wanted) != list(statuses):
+            failures.append(f"status: expected {wanted}, got {statuses}")
+    pos = 0
+    for want in expect.get("sequence") or []:
+        while pos < len(events) and not _matches(events[pos], want):
+            pos += 1
+        if pos >= len(events):
+            failures.append(f"sequence: {json.dumps(want, ensure_ascii=False)} not found in order")
+            break
+        pos += 1
+    kinds = [ev.get("kind") for ev in events]
+    for kind in expect.get("absent") or []:
+        if kind in kinds:
+            failures.append(f"absent: {kind} occurred {kinds.count(kind)}x")
+    for kind, n in (expect.get("counts") or {}).items():
+        if kinds.count(kind) != int(n):
+            failures.append(f"counts: {kind} expected {n}, got {kinds.count(kind)}")
+    return failures
+
+
+def _node_timings(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Per-run wall time and per-node durations, from start/transition/end timestamps."""
+    runs: List[Dict[str, Any]] = []
+    current: Optional[Dict[str, Any]] = None
+    last = 0.0
+    for ev in events:
+        kind = ev.get("kind")
+        if kind == "start":
+            current, last = {"runId": (ev.get("data") or {}).get("runId"), "nodes": {}}, ev["ts"]
+            current["_t0"] = ev["ts"]
+        elif current is not None and kind in ("transition", "run_cancelled"):
+            node = (ev.get("data") or {}).get("node") or ev.get("phase")
+            current["nodes"][node] = round(current["nodes"].get(node, 0.0) + (ev["ts"] - last) * 1000.0, 1)
+            last = ev["ts"]
+        elif current is not None and kind == "end":
+            current["ms"] = round((ev["ts"] - current.pop("_t0")) * 1000.0, 1)
+            runs.append(current)
+            current = None
+    return runs
+
+
+# -- execution ----------------------------------------------------------------
+
+def _link_tree(src: str, dst: str) -> None:
+    os.makedirs(dst, exist_ok=True)
+    for name in os.listdir(src):
+        if name.startswith("."):
+            continue
+        try:
+            os.link(os.path.join(src, name), os.path.join(dst, name))
+        except OSError:
+            shutil.copyfile(os.path.join(src, name), os.path.join(dst, name))
+
+
+def _run_queue(q: Dict[str, Any]) -> List[Optional[str]]:
+    """Enqueue q["jobs"], simulate crashed workers / failing heartbeats, drain with run_worker; return result statuses."""
+    from orchestration.jobqueue import JobQueue, run_worker
+
+    queue = JobQueue()
+    lease_s = float(q.get("lease_s", 60.0))
+    ids = [queue.enqueue(j.get("goal", ""), dict(j.get("constraints") or {}), dict(j.get("context") or {})) for j in q.get("jobs") or []]
+    for _ in range(int(q.get("abandon", 0))):
+        queue.claim("harness-crashed", lease_s)  # never heartbeats or completes
+    if q.get("abandon"):
+        time.sleep(lease_s + 0.05)
+    fail_on = q.get("fail_heartbeats_on_attempt")
+    if fail_on is not None:
+        real = queue.heartbeat
+
+        def _flaky(job_id: str, worker: str, lease_s: float = 60.0) -> bool:
+            job = queue.get(job_id)
+            if job is not None and job.attempts == int(fail_on):
+                raise sqlite3.OperationalError("database is locked")
+            return real(job_id, worker, lease_s)
+
+        queue.heartbeat = _flaky  # type: ignore[method-assign]
+    workers = [
+        threading.Thread(target=run_worker, args=(queue,), kwargs={"worker": f"harness-{i}", "lease_s": lease_s, "poll_s": 0.05, "exit_when_idle": True})
+        for i in range(int(q.get("workers", 1)))
+    ]
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    jobs = [queue.get(i) for i in ids]
+    return [(j.result or {}).get("status") if j is not None else None for j in jobs]
+
+
+def run_scenario(spec: Dict[str, Any], work_root: str, shared_index: Optional[str] = None, record: bool = False) -> Dict[str, Any]:
+    """Run one scenario in its own runtime dir; return its report entry."""
+    from orchestration.graph import run_goal
+    from orchestration.logging import add_listener, log_event, remove_listener
+    from orchestration.providers import fixtures
+
+    name = spec["name"]
+    runtime = os.path.join(work_root, name)
+    shutil.rmtree(runtime, ignore_errors=True)
+    os.makedirs(runtime)
+    if shared_index:
+        _link_tree(shared_index, os.path.join(runtime, "index"))
+    os.environ["WARP_RUNTIME_DIR"] = runtime
+    fixture_path = os.path.join(spec["_dir"], spec["fixtures"]) if spec.get("fixtures") else None
+    if fixture_path:
+        os.environ["WARP_PROVIDER_FIXTURES"] = fixture_path
+        os.environ["WARP_PROVIDER_MODE"] = "record" if record else "replay"
+        if record and os.path.exists(fixture_path):
+            os.unlink(fixture_path)
+    else:
+        os.environ.pop("WARP_PROVIDER_FIXTURES", None)
+    if not record:
+        for var in _KEY_VARS:
+            os.environ.pop(var, None)
+    fixtures.reset()
+
+    grant = dict(spec["approve"]) if isinstance(spec.get("approve"), dict) else {}
+    delay_s = float(grant.pop("delay_s", 0) or 0)
+
+    def _grant(data: Dict[str, Any]) -> None:
+        for action_id in data.get("pending") or [None]:
+            log_event("approval_granted", {**grant, "runId": data.get("runId"), "actionId": action_id, "by": "harness"})
+
+    def _approve(ev: Dict[str, Any]) -> None:
+        if ev.get("kind") == "waiting_for_approval":
+            if delay_s:
+                threading.Timer(delay_s, _grant, args=(ev.get("data") or {},)).start()
+            else:
+                _grant(ev.get("data") or {})
+
+    if spec.get("approve"):
+        add_listener(_approve)
+    statuses: List[Optional[str]] = []
+    error: Optional[str] = None
+    t0 = time.perf_counter()
+    try:
+        for run in spec.get("runs") or []:
+            result = run_goal(run.get("goal", ""), constraints=dict(run.get("constraints") or {}), context=dict(run.get("context") or {}))
+            statuses.append(result.get("status"))
+        if spec.get("queue"):
+            statuses.extend(_run_queue(spec["queue"]))
+    except Exception as e:  # a crash is a scenario failure, not a harness failure
+        error = f"{type(e).__name__}: {e}"
+    finally:
+        if spec.get("approve"):
+            remove_listener(_approve)
+    wall_ms = round((time.perf_counter() - t0) * 1000.0, 1)
+
+    events: List[Dict[str, Any]] = []
+    events_path = os.path.join(runtime, "events.jsonl")
+    if os.path.exists(events_path):
+        with open(events_path, "r", encoding="utf-8") as f:
+            events = [json.loads(line) for line in f if line.strip()]
+        os.makedirs(OUT_DIR, exist_ok=True)
+        shutil.copyfile(events_path, os.path.join(OUT_DIR, f"{name}.jsonl"))
+    failures = ([f"crash: {error}"] if error else []) + check(events, statuses, spec.get("expect") or {})
+    return {
+        "name": name,
+        "ok": not failures,
+        "statuses": statuses,
+        "wall_ms": wall_ms,
+        "runs": _node_timings(events),
+        "events": len(events),
+        "fixture_misses": sum(1 for ev in events if ev.get("kind") == "fixture_miss"),
+        "failures": failures,
+        "pid": os.getpid(),
+    }
+
+
+def _build_shared_index(work_root: str) -> Optional[str]:
+    try:
+        from orchestration.index import TrigramIndex, git_head
+        from orchestration.warm import _git_ls_files
+
+        path = os.path.join(work_root, "_index")
+        index = TrigramIndex(ROOT, index_dir=path)
+        index.update(_git_ls_files(ROOT), head=git_head(ROOT))
+        index.close()
+        return path
+    except Exception:
+        return None
+
+
+def run_all(specs: List[Dict[str, Any]], jobs: Optional[int] = None, record: bool = False, keep: bool = False) -> Dict[str, Any]:
+    jobs = max(1, jobs or os.cpu_count() or 1)
+    if record:
+        jobs = 1  # live calls: keep recordings in a predictable order
+    work_root = tempfile.mkdtemp(prefix="warp-scenarios-")
+    t0 = time.perf_counter()
+    shared_index = _build_shared_index(work_root)
+    index_ms = round((time.perf_counter() - t0) * 1000.0, 1)
+    results: List[Dict[str, Any]] = []
+    try:
+        if jobs == 1 or len(specs) <= 1:
+            results = [run_scenario(s, work_root, shared_index, record) for s in specs]
+        else:
+            with ProcessPoolExecutor(max_workers=min(jobs, len(specs))) as pool:
+                futures = [pool.submit(run_scenario, s, work_root, shared_index, record) for s in specs]
+                for fut in as_completed(futures):
+                    results.append(fut.result())
+    finally:
+        if not keep:
+            shutil.rmtree(work_root, ignore_errors=True)
+    results.sort(key=lambda r: r["name"])
+    total_ms = round((time.perf_counter() - t0) * 1000.0, 1)
+    serial_ms = round(sum(r["wall_ms"] for r in results), 1)
+    report = {
+        "ok": all(r["ok"] for r in results),
+        "scenarios": len(results),
+        "failed": [r["name"] for r in results if not r["ok"]],
+        "jobs": jobs,
+        "index_ms": index_ms,
+        "total_ms": total_ms,
+        "scenario_ms_sum": serial_ms,
+        "slowest": [r["name"] for r in sorted(results, key=lambda r: -r["wall_ms"])[:5]],
+        "work_dir": work_root if keep else None,
+        "results": results,
+    }
+    os.makedirs(OUT_DIR, exist_ok=True)
+    with open(os.path.join(OUT_DIR, "report.json"), "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    return report
+
+
+def _print_report(report: Dict[str, Any]) -> None:
+    print(f"{'scenario':<24} {'result':<6} {'wall_ms':>9}  nodes (ms)")
+    for r in report["results"]:
+        nodes = "; ".join(" ".join(f"{k}={v}" for k, v in run["nodes"].items()) for run in r["runs"])
+        print(f"{r['name']:<24} {'ok' if r['ok'] else 'FAIL':<6} {r['wall_ms']:>9.1f}  {nodes}")
+        for failure in r["failures"]:
+            print(f"    - {failure}")
+    print(f"{report['scenarios']} scenarios, {len(report['failed'])} failed, jobs={report['jobs']}, "
+          f"total {report['total_ms']:.0f}ms (index {report['index_ms']:.0f}ms, sum of scenarios {report['scenario_ms_sum']:.0f}ms)")
+    print(f"report: {os.path.join(OUT_DIR, 'report.json')}")
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Run e2e scenarios in parallel, isolated runtime dirs")
+    parser.add_argument("names", nargs="*", help="scenario names or globs (default: all)")
+    parser.add_argument("--jobs", "-j", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--record", action="store_true", help="call live providers and rewrite fixtures")
+    parser.add_argument("--keep", action="store_true", help="keep per-scenario runtime dirs for inspection")
+    parser.add_argument("--dir", default=SCENARIOS_DIR, help="scenario directory")
+    args = parser.parse_args(argv)
+    specs = discover(args.names, args.dir)
+    if not specs:
+        print("no scenarios found", file=sys.stderr)
+        return 2
+    report = run_all(specs, jobs=args.jobs, record=args.record, keep=args.keep)
+    _print_report(report)
+    return 0 if report["ok"] else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,8 +1,4 @@
-Param()
+Param([Parameter(ValueFromRemainingArguments = $true)] $ScenarioArgs)
 $ErrorActionPreference = 'Stop'
-# Happy path
-try { python tools/e2e/run_happy.py | Write-Output } catch { python3 tools/e2e/run_happy.py | Write-Output }
-# Escalation + error
-try { python tools/e2e/run_escalation.py | Write-Output } catch { python3 tools/e2e/run_escalation.py | Write-Output }
-# Edge cases
-try { python tools/e2e/run_edge.py | Write-Output } catch { python3 tools/e2e/run_edge.py | Write-Output }
+# All scenarios in tools/e2e/scenarios, in parallel with isolated runtime dirs and replayed provider fixtures
+try { python tools/e2e/harness.py @ScenarioArgs | Write-Output } catch { python3 tools/e2e/harness.py @ScenarioArgs | Write-Output }
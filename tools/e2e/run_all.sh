@@ -1,8 +1,4 @@
 #!/usr/bin/env bash
 set -euo pipefail
-# Happy path
-python3 tools/e2e/run_happy.py || python tools/e2e/run_happy.py
-# Escalation + error
-python3 tools/e2e/run_escalation.py || python tools/e2e/run_escalation.py
-# Edge cases
-python3 tools/e2e/run_edge.py || python tools/e2e/run_edge.py
+# All scenarios in tools/e2e/scenarios, in parallel with isolated runtime dirs and replayed provider fixtures
+python3 tools/e2e/harness.py "$@" || python tools/e2e/harness.py "$@"
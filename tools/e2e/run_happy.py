@@ -1,19 +1,20 @@
 #!/usr/bin/env python3
 from __future__ import annotations
-import os, json, shutil
+import os, sys, json, shutil
 from orchestration.graph import run_goal
 
 ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 runtime = os.path.join(ROOT, 'runtime')
-log_path = os.path.join(runtime, 'events.jsonl')
 scenario_out = os.path.join(runtime, 'scenarios')
 os.makedirs(scenario_out, exist_ok=True)
 
-# Clear previous events
-open(log_path, 'w', encoding='utf-8').close()
-
 result = run_goal(goal='happy path demo', constraints={"retries": 1}, context={})
 
+if not result.get('artifacts'):
+    print(json.dumps({"status": result.get('status'), "error": "run artifacts were not published"}))
+    sys.exit(1)
+
 out = os.path.join(scenario_out, 'happy.jsonl')
-shutil.copyfile(log_path, out)
+# Per-run event log from the run's artifact namespace (no shared-file truncation)
+shutil.copyfile(os.path.join(result['artifacts'], 'events.jsonl'), out)
 print(json.dumps({"status": result.get('status'), "events": out}))
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""Local stub of the Anthropic Messages API for provider-layer checks.
+
+Answers POST /v1/messages after a fixed latency with a well-formed reply and
+counts requests, TCP connections and peak concurrency, so connection reuse
+and timeouts can be measured without network access. Prompt caching is
+emulated: the prefix (tools, system, messages) up to each cache_control block
+is "written" the first time it is seen and "read" afterwards, reported in
+usage like the real API. As with the API, a breakpoint on a prefix shorter
+than the model minimum (--min-cache-tokens, default 1024) caches nothing,
+and empty text blocks are rejected with a 400.
+The Message Batches endpoints are emulated too: a batch created with
+POST /v1/messages/batches ends --batch-latency-ms later (GET
+/v1/messages/batches/<id> reports processing_status), its results are served
+as JSONL from the results_url, and POST .../cancel ends it with every request
+canceled.
+Point a client at it with ANTHROPIC_BASE_URL=http://127.0.0.1:<port> and any
+ANTHROPIC_API_KEY.
+
+    python tools/e2e/stub_provider.py --port 8787 --latency-ms 50
+"""
+from __future__ import annotations
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import threading
+import time
+
+
+class StubProvider:
+    def __init__(self, latency_ms: float = 50.0, host: str = "127.0.0.1", port: int = 0, min_cache_tokens: int = 1024, batch_latency_ms: float = 200.0):
+        self.latency_ms = latency_ms
+        self.min_cache_tokens = min_cache_tokens
+        self.batch_latency_ms = batch_latency_ms
+        self.requests = 0
+        self.messages = 0  # model replies produced, synchronous or batched
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.connections = 0
+        self.inflight = 0
+        self.peak_inflight = 0
+        self.last_body: Optional[Dict[str, Any]] = None
+        self.cached_prefixes: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._httpd = ThreadingHTTPServer((host, port), _make_handler(self))
+        self._httpd.daemon_threads = True
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "StubProvider":
+        threading.Thread(target=self._httpd.serve_forever, name="stub-provider", daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def stats(self) -> Dict[str, int]:
+        return {"requests": self.requests, "connections": self.connections, "peak_inflight": self.peak_inflight, "messages": self.messages, "batches": len(self.batches)}
+
+    def reset(self) -> None:
+        with self._lock:
+            self.requests = self.connections = self.peak_inflight = self.messages = 0
+            self.cached_prefixes.clear()
+            self.batches.clear()
+
+    def message(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        """A Messages API reply echoing the prompt."""
+        with self._lock:
+            self.messages += 1
+            n = self.messages
+        prompt = "".join(
+            part.get("text", "") if isinstance(part, dict) else str(part)
+            for msg in body.get("messages") or []
+            for part in (msg.get("content") if isinstance(msg.get("content"), list) else [msg.get("content", "")])
+        )
+        return {
+            "id": f"msg_stub_{n}",
+            "type": "message",
+            "role": "assistant",
+            "model": body.get("model"),
+            "content": [{"type": "text", "text": f"- stub reply to: {prompt[:60]}"}],
+            "stop_reason": "end_turn",
+            "usage": self.usage(body),
+        }
+
+    def create_batch(self, requests: List[Dict[str, Any]]) -> Dict[str, Any]:
+        with self._lock:
+            batch_id = f"msgbatch_stub_{len(self.batches) + 1}"
+            self.batches[batch_id] = {"id": batch_id, "requests": requests, "ends": time.time() + self.batch_latency_ms / 1000.0, "results": None, "canceled": False}
+        return self.batch_status(batch_id)
+
+    def batch_status(self, batch_id: str) -> Optional[Dict[str, Any]]:
+        batch = self.batches.get(batch_id)
+        if batch is None:
+            return None
+        if batch["results"] is None and (batch["canceled"] or time.time() >= batch["ends"]):
+            results = []
+            for req in batch["requests"]:
+                params = req.get("params") or {}
+                if batch["canceled"]:
+                    result: Dict[str, Any] = {"type": "canceled"}
+                elif _has_empty_text(params):
+                    result = {"type": "errored", "error": {"type": "error", "error": {"type": "invalid_request_error", "message": "text content blocks must be non-empty"}}}
+                else:
+                    result = {"type": "succeeded", "message": self.message(params)}
+                results.append({"custom_id": req.get("custom_id"), "result": result})
+            batch["results"] = results
+        ended = batch["results"] is not None
+        counts = {"processing": 0 if ended else len(batch["requests"]), "succeeded": 0, "errored": 0, "canceled": 0, "expired": 0}
+        for item in batch["results"] or []:
+            counts[item["result"]["type"]] += 1
+        return {
+            "id": batch_id,
+            "type": "message_batch",
+            "processing_status": "ended" if ended else "in_progress",
+            "request_counts": counts,
+            "results_url": f"{self.url}/v1/messages/batches/{batch_id}/results" if ended else None,
+        }
+
+    def usage(self, body: Dict[str, Any]) -> Dict[str, int]:
+        """Token usage (~4 chars per token) with the cache accounting of the Messages API."""
+        system = body.get("system")
+        blocks = [{"type": "text", "text": json.dumps(body["tools"], sort_keys=True)}] if body.get("tools") else []
+        blocks.extend(system if isinstance(system, list) else [{"type": "text", "text": system or ""}])
+        for msg in body.get("messages") or []:
+            content = msg.get("content")
+            blocks.extend(content if isinstance(content, list) else [{"type": "text", "text": content or ""}])
+        prefix, total, cached_upto, read, write = "", 0, 0, 0, 0
+        for block in blocks:
+            prefix += block.get("text", "")
+            total = len(prefix) // 4
+            if block.get("cache_control") and total >= self.min_cache_tokens:
+                with self._lock:
+                    if prefix in self.cached_prefixes:
+                        read, write = total, 0
+                    else:
+                        self.cached_prefixes[prefix] = total
+                        write = total - read
+                cached_upto = total
+        return {"input_tokens": max(1, total - cached_upto), "output_tokens": 12, "cache_read_input_tokens": read, "cache_creation_input_tokens": write}
+
+
+def _make_handler(stub: StubProvider):
+    class _Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # keep-alive, so connection reuse is visible
+
+        def log_message(self, *args: Any) -> None:
+            pass
+
+        def setup(self) -> None:
+            super().setup()
+            with stub._lock:
+                stub.connections += 1
+
+        def _begin(self) -> None:
+            with stub._lock:
+                stub.requests += 1
+                stub.inflight += 1
+                stub.peak_inflight = max(stub.peak_inflight, stub.inflight)
+
+        def _end(self) -> None:
+            with stub._lock:
+                stub.inflight -= 1
+
+        def do_POST(self) -> None:
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            self._begin()
+            try:
+                path = self.path.rstrip("/")
+                if path == "/v1/messages/batches":
+                    return self._reply(200, stub.create_batch(body.get("requests") or []))
+                if path.startswith("/v1/messages/batches/") and path.endswith("/cancel"):
+                    batch = stub.batches.get(path.split("/")[4])
+                    if batch is None:
+                        return self._reply(404, {"type": "error", "error": {"type": "not_found_error", "message": "no such batch"}})
+                    batch["canceled"] = True
+                    return self._reply(200, stub.batch_status(batch["id"]))
+                with stub._lock:
+                    stub.last_body = body
+                if _has_empty_text(body):
+                    return self._reply(400, {"type": "error", "error": {"type": "invalid_request_error", "message": "text content blocks must be non-empty"}})
+                time.sleep(stub.latency_ms / 1000.0)
+                self._reply(200, stub.message(body))
+            finally:
+                self._end()
+
+        def do_GET(self) -> None:
+            self._begin()
+            try:
+                parts = self.path.rstrip("/").split("/")  # ["", "v1", "messages", "batches", id, ("results")]
+                status = stub.batch_status(parts[4]) if len(parts) >= 5 and parts[1:4] == ["v1", "messages", "batches"] else None
+                if status is None:
+                    return self._reply(404, {"type": "error", "error": {"type": "not_found_error", "message": "no such batch"}})
+                if len(parts) == 5:
+                    return self._reply(200, status)
+                if status["processing_status"] != "ended":
+                    return self._reply(400, {"type": "error", "error": {"type": "invalid_request_error", "message": "batch has not ended"}})
+                lines = "".join(json.dumps(item) + "\n" for item in stub.batches[parts[4]]["results"])
+                self._reply(200, lines, content_type="application/x-jsonl")
+            finally:
+                self._end()
+
+        def _reply(self, code: int, payload: Any, content_type: str = "application/json") -> None:
+            data = (payload if isinstance(payload, str) else json.dumps(payload)).encode("utf-8")
+            self.send_response(code)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+    return _Handler
+
+
+def _has_empty_text(body: Dict[str, Any]) -> bool:
+    system = body.get("system")
+    blocks = list(system) if isinstance(system, list) else []
+    for msg in body.get("messages") or []:
+        content = msg.get("content")
+        if not content:
+            return True
+        blocks.extend(content if isinstance(content, list) else [])
+    return any(isinstance(b, dict) and b.get("type") == "text" and not b.get("text") for b in blocks)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Anthropic Messages API stub")
+    parser.add_argument("--port", type=int, default=8787)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--min-cache-tokens", type=int, default=1024)
+    parser.add_argument("--batch-latency-ms", type=float, default=200.0, help="time until a message batch ends")
+    args = parser.parse_args()
+    stub = StubProvider(args.latency_ms, port=args.port, min_cache_tokens=args.min_cache_tokens, batch_latency_ms=args.batch_latency_ms).start()
+    print(json.dumps({"url": stub.url}), flush=True)
+    try:
+        while True:
+            time.sleep(5)
+            print(json.dumps(stub.stats()), flush=True)
+    except KeyboardInterrupt:
+        stub.stop()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())